@@ -0,0 +1,2 @@
+from .benchmark import benchmark
+from .synthetic import synthetic
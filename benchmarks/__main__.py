@@ -0,0 +1,4 @@
+from .benchmark import benchmark
+
+if __name__ == "__main__":
+    benchmark.main()
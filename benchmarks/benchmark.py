@@ -0,0 +1,230 @@
+from .synthetic import synthetic
+import numpy as np
+import pandas as pd
+import polars as pl
+
+class benchmark:
+    # Number of timed run for each case, the first untimed run is kept separately as the cold time
+    _repeat = 3
+    _result_dir = "benchmarks/results"
+    # Package version written with the result, so a change of timing can be traced to an upgrade
+    _packages = ("numpy", "pandas", "polars", "pyarrow", "geopandas", "shapely", "scipy")
+    # Module imported in a new interpreter for the cold start case, the pages and the command line tools import these first
+    _import_modules = ("spm", "spm.file", "spm.cache", "spm.build", "spm.population", "spm.map")
+
+    def prepare(data:dict) -> dict:
+        # Import necessary packages
+        import geopandas as gpd
+        from spm.file import file
+        from spm.distance import distance
+
+        # Nearest GP and district of every grid cell, used by the ann cases
+        matched_index, distance_km = distance.nearest(data["grid"], "Y", "X", data["gp"], "Latitude", "Longitude")
+        district = gpd.read_file(file._map_district)
+        district_num = synthetic.tile("district", data["grid"]["X"].to_numpy(), data["grid"]["Y"].to_numpy())
+        area = district.to_crs({"proj":"cea"}).area.to_numpy() / 10**6
+        data["matched"] = pl.from_pandas(data["grid"]).with_columns(pl.Series("id", data["gp"]["id"].to_numpy()[matched_index]),
+                                                                     pl.Series("distance_km", distance_km),
+                                                                     pl.Series("district", district.loc[:,"district"].to_numpy()[district_num]),
+                                                                     pl.Series("area", area[district_num]))
+
+        # Boundary as geodataframe for the spatial join cases
+        data["district"] = district
+        data["parlimen"] = gpd.read_file(file._map_parlimen)
+
+        # Return the data
+        return data
+
+    def cases() -> dict:
+        # Import necessary packages
+        import shutil
+        from spm.file import file
+        from spm.map import map
+        from spm.distance import distance
+        from spm.crosswalk import crosswalk
+        from spm.population import population
+
+        # Each case as (setup, function), setup is not timed and its result is passed to the function
+        return {"haversine":(lambda data: (data["grid"]["Y"].to_numpy(), data["grid"]["X"].to_numpy(),
+                                           np.resize(data["gp"]["Latitude"].to_numpy(), len(data["grid"])),
+                                           np.resize(data["gp"]["Longitude"].to_numpy(), len(data["grid"]))),
+                             lambda args: distance.haversine(*args)),
+                "match_nearest":(lambda data: (data["grid"].copy(), data["gp"]),
+                                 lambda args: distance.match_nearest(df1=args[0], df1_lat="Y", df1_lon="X",
+                                                                     df2=args[1], df2_lat="Latitude", df2_lon="Longitude",
+                                                                     column_to_match="id")),
+                "convert_pandas_geopandas":(lambda data: data["grid"],
+                                            lambda df: map.convert_pandas_geopandas(df, lon="X", lat="Y")),
+                "sjoin_point_district":(lambda data: (map.convert_pandas_geopandas(data["grid"], lon="X", lat="Y"), data["district"]),
+                                        lambda args: args[0].sjoin(args[1], how="inner", predicate="within")),
+                "sjoin_parlimen_district":(lambda data: (data["parlimen"], data["district"].drop(columns="state")),
+                                           lambda args: args[0].sjoin(args[1])),
+                "crosswalk_build":(lambda data: shutil.rmtree(file._cache_raster, ignore_errors=True),
+                                   lambda args: crosswalk.build()),
+                "ann":(lambda data: data["matched"],
+                       lambda df: population.ann(df, n_column="Z", a_column="area", distance_column="distance_km")),
+                "ann_grouped":(lambda data: data["matched"],
+                               lambda df: population.ann_grouped(df, n_column="Z", a_column="area", distance_column="distance_km")),
+                "convert_str_to_long":(lambda data: data["str"],
+                                       lambda df: population.convert_str_to_long(df)),
+                "str_population_ascii_households":(lambda data: None,
+                                                   lambda args: population.str_population_ascii("households")),
+                "str_population_ascii_individual":(lambda data: None,
+                                                   lambda args: population.str_population_ascii("individual")),
+                **{f"import_{module.replace('.', '_')}":(lambda data: None, lambda args, module=module: benchmark.import_module(module))
+                   for module in benchmark._import_modules}}
+
+    def import_module(module:str) -> None:
+        # Import necessary packages
+        import os
+        import sys
+        import subprocess
+
+        # New interpreter for each run so nothing is loaded yet, the time include the interpreter start as for a page or command
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = {**os.environ, "PYTHONPATH":os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))}
+        subprocess.run([sys.executable, "-c", f"import {module}"], check=True, env=env, cwd=root)
+
+    def time(setup,
+             function,
+             data:dict,
+             repeat:int = _repeat) -> dict:
+        # Import necessary packages
+        import gc
+        import time
+
+        # The first run include the cache build and lazy import, so it is kept apart from the timed run
+        times = []
+        for num in range(repeat + 1):
+            args = setup(data)
+            gc.collect()
+            start = time.perf_counter()
+            function(args)
+            times.append(time.perf_counter() - start)
+
+        # Return the timing in seconds
+        return {"first":times[0], "times":times[1:], "min":min(times[1:]), "median":float(np.median(times[1:])),
+                "mean":float(np.mean(times[1:]))}
+
+    def environment() -> dict:
+        # Import necessary packages
+        import os
+        import sys
+        import platform
+        import subprocess
+        from importlib.metadata import version, PackageNotFoundError
+
+        # Commit of the code being timed, empty when not run inside the git repo
+        try:
+            commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        except OSError:
+            commit = ""
+
+        # Version of each package, None when it is not installed
+        versions = {}
+        for package in benchmark._packages:
+            try:
+                versions[package] = version(package)
+            except PackageNotFoundError:
+                versions[package] = None
+
+        # Return the environment
+        return {"commit":commit, "python":sys.version.split()[0], "platform":platform.platform(),
+                "processor":platform.processor(), "cpu_count":os.cpu_count(), "versions":versions}
+
+    def run(size:str = "small",
+            repeat:int = _repeat,
+            case_list:list|None = None,
+            workdir:str|None = None,
+            seed:int = 0) -> dict:
+        # Import necessary packages
+        import os
+        import tempfile
+        from datetime import datetime
+
+        # The synthetic data is written to the same relative path as spm.file under the work directory, so it must be a new or
+        # empty directory, otherwise the real data under data/ of the repo would be overwritten. The given work directory is kept
+        if workdir is not None and os.path.isdir(workdir) and os.listdir(workdir):
+            raise ValueError(f"Work directory {workdir} is not empty, the synthetic data would overwrite the files in it")
+        temp_dir = tempfile.TemporaryDirectory(prefix="spm_benchmark_") if workdir is None else None
+        workdir = temp_dir.name if workdir is None else workdir
+        os.makedirs(workdir, exist_ok=True)
+        cwd = os.getcwd()
+        case_dict = benchmark.cases()
+        case_list = list(case_dict) if case_list is None else case_list
+        result = {"size":size, "count":synthetic._sizes[size], "seed":seed, "repeat":repeat,
+                  "created":datetime.now().isoformat(timespec="seconds"), **benchmark.environment(), "results":{}}
+
+        try:
+            os.chdir(workdir)
+            data = benchmark.prepare(synthetic.write(".", size, seed))
+            for name in case_list:
+                result["results"][name] = benchmark.time(*case_dict[name], data, repeat)
+                print(f"{name:<34} first {result['results'][name]['first']:>9.4f}s  median {result['results'][name]['median']:>9.4f}s")
+        finally:
+            os.chdir(cwd)
+            if temp_dir is not None:
+                temp_dir.cleanup()
+
+        # Return the result
+        return result
+
+    def write(result:dict,
+              output_file:str|None = None) -> str:
+        # Import necessary packages
+        import os
+        import json
+
+        # Default to one file for each run, named by the size and time so the older result is kept
+        if output_file is None:
+            output_file = os.path.join(benchmark._result_dir, f"{result['size']}_{result['created'].replace(':', '')}.json")
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        with open(f"{output_file}.tmp", "w") as f:
+            json.dump(result, f, indent=2)
+        os.replace(f"{output_file}.tmp", output_file)
+
+        # Return the file path
+        return output_file
+
+    def compare(result:dict,
+                baseline_file:str) -> pd.DataFrame:
+        # Import necessary packages
+        import json
+
+        # Ratio of the median against the baseline, above 1 is slower
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        if baseline["size"] != result["size"]:
+            print(f"Baseline is {baseline['size']} size but the current run is {result['size']} size")
+        df = pd.DataFrame({"baseline":{name:value["median"] for name, value in baseline["results"].items()},
+                           "current":{name:value["median"] for name, value in result["results"].items()}})\
+               .dropna()
+        df.loc[:,"ratio"] = df.loc[:,"current"] / df.loc[:,"baseline"]
+
+        # Return the comparison
+        return df
+
+    def main(argv:list|None = None) -> None:
+        # Import necessary packages
+        import argparse
+
+        # Prepare the command line options
+        parser = argparse.ArgumentParser(description="Time the spm functions on synthetic Malaysia-scale data")
+        parser.add_argument("--size", choices=list(synthetic._sizes), default="small")
+        parser.add_argument("--repeat", type=int, default=benchmark._repeat)
+        parser.add_argument("--case", action="append", choices=list(benchmark.cases()), default=None)
+        parser.add_argument("--workdir", default=None, help="New or empty directory to keep the synthetic data in, default to a temporary directory")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output-file", default=None)
+        parser.add_argument("--compare", default=None, help="Result json of an earlier run to compare the median with")
+        args = parser.parse_args(argv)
+
+        # Run the benchmark and write the result
+        result = benchmark.run(size=args.size, repeat=args.repeat, case_list=args.case, workdir=args.workdir, seed=args.seed)
+        print(f"Result written to {benchmark.write(result, args.output_file)}")
+        if args.compare is not None:
+            print(benchmark.compare(result, args.compare).to_string(float_format=lambda value: f"{value:.4f}"))
+
+if __name__ == "__main__":
+    benchmark.main()
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+import polars as pl
+
+class synthetic:
+    # Bounding box of Malaysia as (min lon, min lat, max lon, max lat)
+    _bounds = (99.6, 0.85, 119.3, 7.4)
+    # Number of grid cells, GP and STR households for each size, malaysia is close to the real 1km grid, GP list and STR database
+    _sizes = {"small":{"grid":10_000, "gp":200, "str":50_000},
+              "medium":{"grid":100_000, "gp":1_500, "str":500_000},
+              "malaysia":{"grid":330_000, "gp":8_000, "str":4_000_000}}
+    # Number of columns and rows of rectangle for each boundary level, every level nest inside the state and dun inside parlimen
+    _boundary_shape = {"state":(4, 4), "district":(16, 8), "parlimen":(20, 8), "dun":(40, 16)}
+    _str_category = ("Isi Rumah", "Bujang", "Warga Emas")
+
+    def grid(n:int,
+             seed:int = 0) -> pd.DataFrame:
+        # WorldPop XYZ layout, X is lon, Y is lat and Z is the population of the cell
+        rng = np.random.default_rng(seed)
+        minx, miny, maxx, maxy = synthetic._bounds
+        return pd.DataFrame({"X":rng.uniform(minx, maxx, n).astype(np.float32),
+                             "Y":rng.uniform(miny, maxy, n).astype(np.float32),
+                             "Z":rng.lognormal(3, 1.5, n)})
+
+    def gp(n:int,
+           seed:int = 1) -> pd.DataFrame:
+        # Same columns as the GP list used for the nearest search
+        rng = np.random.default_rng(seed)
+        minx, miny, maxx, maxy = synthetic._bounds
+        return pd.DataFrame({"id":np.arange(n),
+                             "clinic_name":[f"Klinik {num}" for num in range(n)],
+                             "Latitude":rng.uniform(miny, maxy, n),
+                             "Longitude":rng.uniform(minx, maxx, n)})
+
+    def tile(level:str,
+             x:np.ndarray,
+             y:np.ndarray) -> np.ndarray:
+        # Position of the rectangle that contain each point, in row major order same as the feature order
+        ncols, nrows = synthetic._boundary_shape[level]
+        minx, miny, maxx, maxy = synthetic._bounds
+        col = np.clip(((np.asarray(x) - minx) / (maxx - minx) * ncols).astype(np.int64), 0, ncols - 1)
+        row = np.clip(((np.asarray(y) - miny) / (maxy - miny) * nrows).astype(np.int64), 0, nrows - 1)
+        return row * ncols + col
+
+    def center(level:str,
+               num:np.ndarray) -> tuple:
+        # Lon and lat of the center of each rectangle
+        ncols, nrows = synthetic._boundary_shape[level]
+        minx, miny, maxx, maxy = synthetic._bounds
+        return (minx + (np.asarray(num) % ncols + 0.5) * (maxx - minx) / ncols,
+                miny + (np.asarray(num) // ncols + 0.5) * (maxy - miny) / nrows)
+
+    def properties(level:str,
+                   num:np.ndarray) -> list:
+        # Center of each rectangle, used to find the state and parlimen it belong to
+        x, y = synthetic.center(level, num)
+        code_state = synthetic.tile("state", x, y) + 1
+        code_parlimen = synthetic.tile("parlimen", x, y) + 1
+
+        # Same properties as the boundary geojson of each level
+        if level == "state":
+            return [{"state":f"State {s}", "code_state":int(s)} for s in code_state]
+        if level == "district":
+            return [{"state":f"State {s}", "district":f"District {d + 1}", "code_state":int(s), "code_district":int(d + 1),
+                     "code_state_district":f"{s}_{d + 1}"} for s, d in zip(code_state, num)]
+        if level == "parlimen":
+            return [{"state":f"State {s}", "parlimen":f"P.{p:03d} Parlimen {p}", "code_state":int(s), "code_parlimen":f"P.{p:03d}"}
+                    for s, p in zip(code_state, code_parlimen)]
+        return [{"state":f"State {s}", "parlimen":f"P.{p:03d} Parlimen {p}", "dun":f"N.{d + 1:02d} Dun {d + 1}", "code_state":int(s),
+                 "code_parlimen":f"P.{p:03d}", "code_dun":f"N.{d + 1:02d}", "code_state_dun":f"{s}_N.{d + 1:02d}"}
+                for s, p, d in zip(code_state, code_parlimen, num)]
+
+    def boundary(level:str) -> dict:
+        # Rectangle tiling of the bounding box as a geojson feature collection
+        ncols, nrows = synthetic._boundary_shape[level]
+        minx, miny, maxx, maxy = synthetic._bounds
+        width, height = (maxx - minx) / ncols, (maxy - miny) / nrows
+        num = np.arange(ncols * nrows)
+        feature_list = []
+        for index, properties in zip(num, synthetic.properties(level, num)):
+            x0, y0 = minx + index % ncols * width, miny + index // ncols * height
+            ring = [[x0, y0], [x0 + width, y0], [x0 + width, y0 + height], [x0, y0 + height], [x0, y0]]
+            feature_list.append({"type":"Feature", "properties":properties, "geometry":{"type":"Polygon", "coordinates":[ring]}})
+
+        # Return the geojson
+        return {"type":"FeatureCollection", "features":feature_list}
+
+    def str_records(n:int,
+                    seed:int = 2) -> pl.DataFrame:
+        # One row for each dependent of the household, household without dependent still has one row
+        rng = np.random.default_rng(seed)
+        minx, miny, maxx, maxy = synthetic._bounds
+        household = np.repeat(np.arange(n), 1 + rng.poisson(0.6, n))
+        rows = len(household)
+        code_parlimen = synthetic.tile("parlimen", rng.uniform(minx, maxx, n), rng.uniform(miny, maxy, n))[household] + 1
+        has_partner = (rng.random(n) < 0.6)[household]
+        has_dependent = rng.random(rows) < 0.5
+        parlimen = pl.DataFrame(synthetic.properties("parlimen", np.arange(np.prod(synthetic._boundary_shape["parlimen"]))))
+
+        # Beneficiary, partner and dependent id in separate range, same as the STR database where each id is unique
+        return pl.DataFrame({"id":np.arange(rows),
+                             "id_ben":household,
+                             "sex_beneficiary":rng.choice(["male", "female"], rows),
+                             "ori_ben_age":rng.integers(21, 90, n)[household].astype(np.float64),
+                             "str_category":rng.choice(synthetic._str_category, n)[household],
+                             "state":parlimen["state"].to_numpy()[code_parlimen - 1],
+                             "code_parlimen":parlimen["code_parlimen"].to_numpy()[code_parlimen - 1],
+                             "id_partner":pl.Series(n + household).scatter(np.flatnonzero(~has_partner), None),
+                             "sex_partner":rng.choice(["male", "female"], rows),
+                             "age_partner":rng.integers(21, 90, n)[household].astype(np.float64),
+                             "id_dependent":pl.Series(2 * n + np.arange(rows)).scatter(np.flatnonzero(~has_dependent), None),
+                             "sex_dependent":rng.choice(["male", "female"], rows),
+                             "age_dependent":rng.integers(0, 21, rows).astype(np.float64)})
+
+    def parlimen_population(seed:int = 3) -> pl.DataFrame:
+        # Same layout as the DOSM parlimen population, in thousand, with the breakdown row that str_population_ascii filter out
+        rng = np.random.default_rng(seed)
+        parlimen = pl.DataFrame(synthetic.properties("parlimen", np.arange(np.prod(synthetic._boundary_shape["parlimen"]))))\
+                     .select("state", "parlimen")
+        breakdown = pl.DataFrame({"sex":["both", "male", "female"], "age":["overall"] * 3, "ethnicity":["overall"] * 3})
+        df = parlimen.join(pl.DataFrame({"date":pl.Series(["2020-01-01", "2022-01-01"]).str.to_date()}), how="cross")\
+                     .join(breakdown, how="cross")
+
+        # Return the dataframe
+        return df.with_columns(pl.Series("population", rng.uniform(50, 250, len(df))))
+
+    def write(root:str,
+              size:str = "small",
+              seed:int = 0) -> dict:
+        # Import necessary packages
+        import os
+        import json
+        from spm.file import file
+
+        # Write every input at the same relative path as spm.file, so the pipeline read them when run from root
+        count = synthetic._sizes[size]
+        path = lambda relative: os.path.join(root, relative)
+        for relative in (file._population_ascii, file._map_state, file._file_spm_parquet):
+            os.makedirs(os.path.dirname(path(relative)), exist_ok=True)
+        data = {"grid":synthetic.grid(count["grid"], seed),
+                "gp":synthetic.gp(count["gp"], seed + 1),
+                "str":synthetic.str_records(count["str"], seed + 2),
+                "parlimen_population":synthetic.parlimen_population(seed + 3)}
+        data["grid"].to_csv(path(file._population_ascii), index=False)
+        data["gp"].to_parquet(path(file._gp_parquet), index=False)
+        data["str"].write_parquet(path(file._file_spm_parquet))
+        data["parlimen_population"].write_parquet(path(file._population_parlimen))
+        for level, map_file in {"state":file._map_state, "district":file._map_district,
+                                "parlimen":file._map_parlimen, "dun":file._map_dun}.items():
+            with open(path(map_file), "w") as f:
+                json.dump(synthetic.boundary(level), f)
+
+        # Return the dataframes that were written
+        return data
@@ -1,17 +1,50 @@
-from .descriptive import descriptive
-from .distance import distance
-from .file import file
-from .map import map
-from .population import population
-from .provider import provider
+import sys
+import types
+
+# Class of each submodule, imported on first use so that import spm does not load pandas, geopandas or scipy
+_modules = ("accessibility", "assignment", "batch", "boundary", "build", "cache", "crosswalk", "descriptive", "distance", "file",
+            "figure", "geocode", "grid", "hexbin", "map", "memory", "neighbor", "population", "provider", "raster", "refresh", "scraper",
+            "service_area", "timing")
+# Class that is not wrapped by the timing, the timing itself and the stage runner
+_not_instrumented = ("memory", "timing", "build")
+
+def _load(name:str):
+    # Import necessary packages
+    import importlib
+
+    # Import the submodule, the package attribute is set to its class by _package.__setattr__
+    if name not in _modules:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    importlib.import_module(f".{name}", __name__)
+    return globals()[name]
+
+class _package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # Importing a submodule set it on the package, keep the class of the same name instead, e.g. spm.file._gp_file
+        if name in _modules and isinstance(value, types.ModuleType) and hasattr(value, name):
+            value = getattr(value, name)
+
+            # Time every public function when SPM_PROFILE is set, nothing is wrapped otherwise
+            if name not in _not_instrumented:
+                from .timing import timing
+                if timing.enabled():
+                    timing.instrument(value)
+        super().__setattr__(name, value)
+
+def __getattr__(name:str):
+    # First use of spm.<name>
+    return _load(name)
+
+def __dir__() -> list:
+    # Include the class not imported yet
+    return sorted(set(globals()) | set(_modules))
 
 class spm:
-    def __init__(self):
-        self.descriptive = descriptive(self)
-        self.distance = distance(self)
-        self.file = file(self)
-        self.map = map(self)
-        self.provider = provider(self)
-        self.population = population(self)
-        
-        
\ No newline at end of file
+    # Every class of the package as attribute, e.g. spm().distance.haversine(...) is the same as spm.distance.haversine(...)
+    def __getattr__(self, name:str):
+        return _load(name)
+
+    def __dir__(self) -> list:
+        return sorted(_modules)
+
+sys.modules[__name__].__class__ = _package
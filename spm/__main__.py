@@ -0,0 +1,24 @@
+import sys
+
+def main(argv:list|None = None) -> None:
+    # Import necessary packages
+    import argparse
+
+    # Each command is handled by the main of its module, the rest of the arguments are passed to it
+    commands = {"build":"Build the derived parquet files whose inputs changed",
+                "nearest":"Match the nearest GP for every grid point in chunks with checkpoint"}
+    parser = argparse.ArgumentParser(prog="python -m spm")
+    parser.add_argument("command", choices=list(commands), help="; ".join(f"{key}: {value}" for key, value in commands.items()))
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    # Run the command
+    if args.command == "build":
+        from .build import build
+        build.main(args.args)
+    elif args.command == "nearest":
+        from .batch import batch
+        batch.main(args.args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+from .neighbor import neighbor
+import numpy as np
+import pandas as pd
+import polars as pl
+
+class accessibility:
+    # Catchment radius in km, beyond that the GP is not reachable for the grid point
+    _catchment_km = 10
+    # Enhanced 2SFCA travel zones in km and their gaussian decay weights (Luo & Qi, 2009)
+    _zone_km = [3, 6, 10]
+    _zone_weight = [1.0, 0.68, 0.22]
+
+    def decay_weight(distance_km:np.ndarray,
+                     catchment_km:float = _catchment_km,
+                     zone_km:list|tuple = _zone_km,
+                     zone_weight:list|tuple = _zone_weight,
+                     method:str = "zone") -> np.ndarray:
+        # Step weights based on which zone the distance fall into, the last zone's weight is given out to the catchment edge
+        # so a GP between the last zone and the catchment radius is not counted in the catchment without any weight
+        if method == "zone":
+            if len(zone_km) != len(zone_weight) or np.any(np.diff(zone_km) <= 0):
+                raise ValueError(f"zone_km must be increasing and match zone_weight: {zone_km}, {zone_weight}")
+            weight = np.asarray(zone_weight, dtype=np.float64)[np.searchsorted(np.asarray(zone_km), distance_km, side="left").clip(max=len(zone_km) - 1)]
+        # Continuous gaussian weights rescaled to fall from 1 to 0 at the catchment radius
+        elif method == "gaussian":
+            weight = (np.exp(-0.5 * (distance_km / catchment_km)**2) - np.exp(-0.5)) / (1 - np.exp(-0.5))
+        else:
+            raise ValueError(f"Unknown decay method: {method}")
+
+        # Outside the catchment will have no weight
+        return np.where(distance_km <= catchment_km, weight, 0.0)
+
+    def e2sfca(df:pd.DataFrame|pl.DataFrame,
+               gp_df:pd.DataFrame|pl.DataFrame,
+               lat:str = "Y",
+               lon:str = "X",
+               population_column:str = "estimated_str",
+               gp_lat:str = "Latitude",
+               gp_lon:str = "Longitude",
+               supply_column:str|None = None,
+               catchment_km:float = _catchment_km,
+               zone_km:list|tuple = _zone_km,
+               zone_weight:list|tuple = _zone_weight,
+               method:str = "zone",
+               per_population:float = 1000,
+               accessibility_column:str = "accessibility"):
+        # Import necessary packages
+        from scipy.sparse import csr_matrix
+
+        # Find every grid point and GP pair within the catchment as CSR neighbor list
+        indptr, gp_index, distance_km = neighbor.within_radius(df, lat, lon, gp_df, gp_lat, gp_lon,
+                                                               radius_km=catchment_km)
+
+        # Build the sparse grid point x GP weight matrix
+        weight = csr_matrix((accessibility.decay_weight(distance_km, catchment_km, zone_km, zone_weight, method), gp_index, indptr),
+                            shape=(len(df), len(gp_df)))
+
+        # Each GP is 1 supply unit unless the supply column (e.g. number of doctors) is given
+        population = np.nan_to_num(np.asarray(df[population_column], dtype=np.float64))
+        supply = np.ones(len(gp_df)) if supply_column is None else np.asarray(gp_df[supply_column], dtype=np.float64)
+
+        # Step 1: supply to weighted population ratio for each GP
+        demand = weight.T @ population
+        ratio = np.divide(supply, demand, out=np.zeros(len(gp_df)), where=demand > 0)
+
+        # Step 2: add up the weighted ratio of all GPs reachable from each grid point
+        score = weight @ ratio * per_population
+
+        # Return the dataframe with the accessibility score per grid point
+        if isinstance(df, pl.DataFrame):
+            return df.with_columns(pl.Series(accessibility_column, score))
+        df = df.copy()
+        df.loc[:,accessibility_column] = score
+        return df
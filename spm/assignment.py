@@ -0,0 +1,127 @@
+from .file import file
+from .distance import distance
+from .neighbor import neighbor
+import numpy as np
+import pandas as pd
+
+class assignment:
+    # Small margin on the search radius for the rounding of the Voronoi vertex
+    _radius_margin = 1e-9
+
+    def build(df:pd.DataFrame,
+              gp_df:pd.DataFrame,
+              df1_lat:str = "lat",
+              df1_lon:str = "lon",
+              df2_lat:str = "Latitude",
+              df2_lon:str = "Longitude",
+              column_to_match:str = "id",
+              distance_column:str = "distance_km") -> dict:
+        # The cell tree is built once, every later update only query the part of the grid around the changed GP
+        cell_xyz = distance.to_unit_sphere(df[df1_lat], df[df1_lon])
+        matched_id = df.loc[:,column_to_match].to_numpy()
+
+        # Row position of the cells served by each GP, so a removed GP find its cells without scanning the grid
+        order = np.argsort(matched_id, kind="stable")
+        gp_id, start = np.unique(matched_id[order], return_index=True)
+        members = dict(zip(gp_id.tolist(), np.split(order, start[1:])))
+
+        # Return the state of the assignment, df is updated in place
+        return {"df":df, "gp_df":gp_df.reset_index(drop=True), "cell_xyz":cell_xyz, "tree":distance.build_tree(df[df1_lat], df[df1_lon]),
+                "members":members, "df1_lat":df1_lat, "df1_lon":df1_lon, "df2_lat":df2_lat, "df2_lon":df2_lon,
+                "column_to_match":column_to_match, "distance_column":distance_column}
+
+    def voronoi_radius(gp_xyz:np.ndarray,
+                       new_index:np.ndarray) -> np.ndarray:
+        # Import necessary packages
+        from scipy.spatial import SphericalVoronoi
+
+        # The Voronoi region of a GP is within the ball up to its farthest vertex, as chord on the unit sphere
+        radius = np.full(len(new_index), np.inf)
+        unique_xyz, inverse = np.unique(np.round(gp_xyz, 12), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        try:
+            voronoi = SphericalVoronoi(unique_xyz / np.linalg.norm(unique_xyz, axis=1)[:, None])
+        except ValueError:
+            return radius
+        for num, gp_index in enumerate(new_index):
+            vertices = voronoi.vertices[voronoi.regions[inverse[gp_index]]]
+            radius[num] = np.linalg.norm(vertices - gp_xyz[gp_index], axis=1).max()
+
+        # Return the radius of each new GP
+        return radius
+
+    def _reassign(state:dict,
+                  rows:np.ndarray,
+                  matched_id:np.ndarray,
+                  distance_km:np.ndarray) -> None:
+        # Move the rows from their old GP to the new GP in the member list
+        df, members = state["df"], state["members"]
+        old_id = df.loc[:,state["column_to_match"]].to_numpy()[rows]
+        for gp_id in np.unique(old_id).tolist():
+            if gp_id in members:
+                members[gp_id] = np.setdiff1d(members[gp_id], rows[old_id == gp_id], assume_unique=True)
+        for gp_id in np.unique(matched_id).tolist():
+            members[gp_id] = np.union1d(members.get(gp_id, np.empty(0, dtype=np.int64)), rows[matched_id == gp_id])
+
+        # Write the new id and distance back to the same dataframe
+        df.iloc[rows, df.columns.get_loc(state["column_to_match"])] = matched_id
+        df.iloc[rows, df.columns.get_loc(state["distance_column"])] = distance_km
+
+    def add_gp(state:dict,
+               new_gp_df:pd.DataFrame) -> np.ndarray:
+        # Add the new GP to the GP list
+        gp_df = pd.concat([state["gp_df"], new_gp_df], ignore_index=True)
+        state["gp_df"] = gp_df
+        df, distance_column = state["df"], state["distance_column"]
+        gp_xyz = distance.to_unit_sphere(gp_df[state["df2_lat"]], gp_df[state["df2_lon"]])
+        new_index = np.arange(len(gp_df) - len(new_gp_df), len(gp_df))
+
+        # Only the cells within the new Voronoi region can change, the region is also never farther than the current farthest cell
+        max_chord = float(neighbor.km_to_chord(df.loc[:,distance_column].max())) if len(df) > 0 else 0.0
+        radius = np.minimum(assignment.voronoi_radius(gp_xyz, new_index), max_chord) + assignment._radius_margin
+        candidate = state["tree"].query_ball_point(gp_xyz[new_index], r=radius)
+        rows = np.unique(np.concatenate([np.asarray(item, dtype=np.int64) for item in candidate] + [np.empty(0, dtype=np.int64)]))
+        if len(rows) == 0:
+            return rows
+
+        # Nearest new GP of each candidate cell, keep the cell that is nearer to it than to its current GP
+        matched_index, distance_km = distance.nearest(df.iloc[rows], state["df1_lat"], state["df1_lon"],
+                                                      gp_df.iloc[new_index], state["df2_lat"], state["df2_lon"])
+        closer = distance_km < df.iloc[rows, df.columns.get_loc(distance_column)].to_numpy()
+        rows = rows[closer]
+        assignment._reassign(state, rows, gp_df.iloc[new_index][state["column_to_match"]].to_numpy()[matched_index[closer]], distance_km[closer])
+
+        # Return the rows that changed
+        return rows
+
+    def remove_gp(state:dict,
+                  gp_id_list:list|tuple|np.ndarray) -> np.ndarray:
+        # Remove the GP from the GP list
+        column_to_match = state["column_to_match"]
+        gp_df = state["gp_df"]
+        state["gp_df"] = gp_df = gp_df.loc[~gp_df.loc[:,column_to_match].isin(gp_id_list)].reset_index(drop=True)
+
+        # Only the cells served by the removed GP need a new GP
+        rows = np.concatenate([state["members"].pop(gp_id, np.empty(0, dtype=np.int64)) for gp_id in gp_id_list] + [np.empty(0, dtype=np.int64)])
+        rows = np.sort(rows)
+        if len(rows) == 0:
+            return rows
+        df = state["df"]
+        matched_id, distance_km = distance.nearest(df.iloc[rows], state["df1_lat"], state["df1_lon"],
+                                                   gp_df, state["df2_lat"], state["df2_lon"], column_to_match=column_to_match)
+        assignment._reassign(state, rows, matched_id, distance_km)
+
+        # Return the rows that changed
+        return rows
+
+    def write(state:dict,
+              output_file:str = file._population_str_ascii_gp_households) -> str:
+        # Import necessary packages
+        import os
+
+        # Write to temporary file then rename, so the old file is kept if anything fail
+        state["df"].to_parquet(f"{output_file}.tmp", engine="pyarrow")
+        os.replace(f"{output_file}.tmp", output_file)
+
+        # Return the file path
+        return output_file
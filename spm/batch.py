@@ -0,0 +1,142 @@
+from .file import file
+from .distance import distance
+from .timing import timing
+import pandas as pd
+
+class batch:
+    # Number of grid points per chunk, each chunk is written as one checkpoint
+    _chunk_size = 50_000
+
+    def _match_chunk(chunk_path:str,
+                     chunk:pd.DataFrame,
+                     gp_df:pd.DataFrame,
+                     df1_lat:str,
+                     df1_lon:str,
+                     df2_lat:str,
+                     df2_lon:str,
+                     column_to_match:str,
+                     distance_column:str) -> str:
+        # Import necessary packages
+        import os
+
+        # Match the nearest GP for this chunk only
+        df = distance.match_nearest(df1=chunk, df1_lat=df1_lat, df1_lon=df1_lon,
+                                    df2=gp_df, df2_lat=df2_lat, df2_lon=df2_lon,
+                                    column_to_match=column_to_match,
+                                    distance_column=distance_column)
+
+        # Write to temporary file first then rename, so a half written chunk never count as finished
+        df.to_parquet(f"{chunk_path}.tmp", engine="pyarrow", index=False)
+        os.replace(f"{chunk_path}.tmp", chunk_path)
+
+        # Return the finished chunk path
+        return chunk_path
+
+    def _manifest(grid_file:str,
+                  gp_file:str,
+                  **kwargs) -> dict:
+        # Import necessary packages
+        import os
+
+        # Checkpoints are only valid for the same input files and the same settings
+        return {"grid_file":os.path.abspath(grid_file),
+                "grid_mtime":os.path.getmtime(grid_file),
+                "grid_size":os.path.getsize(grid_file),
+                "gp_file":os.path.abspath(gp_file),
+                "gp_mtime":os.path.getmtime(gp_file),
+                "gp_size":os.path.getsize(gp_file),
+                **kwargs}
+
+    def run_nearest(grid_file:str = file._population_str_ascii_gp_households,
+                    gp_file:str = file._full_gp_file,
+                    output_file:str = file._population_ascii_all_gp,
+                    checkpoint_dir:str = file._checkpoint_nearest,
+                    gp_sheet_name:str = "gp_list",
+                    df1_lat:str = "lat",
+                    df1_lon:str = "lon",
+                    df2_lat:str = "Latitude",
+                    df2_lon:str = "Longitude",
+                    column_to_match:str = "BIL",
+                    distance_column:str = "distance_km",
+                    chunk_size:int = _chunk_size,
+                    max_workers:int|None = None) -> pd.DataFrame:
+        # Import necessary packages
+        import glob
+        import json
+        import os
+        import logging
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        # Read the grid and the GP file
+        population = pd.read_parquet(grid_file).rename(columns={"X":"lon", "Y":"lat"})
+        gp_df = pd.read_excel(gp_file, sheet_name=gp_sheet_name)
+
+        # Remove checkpoints from a different input or setting before resume
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        manifest = batch._manifest(grid_file, gp_file, rows=len(population), chunk_size=chunk_size,
+                                   column_to_match=column_to_match, distance_column=distance_column)
+        manifest_file = os.path.join(checkpoint_dir, "manifest.json")
+        if os.path.exists(manifest_file):
+            with open(manifest_file) as f:
+                previous_manifest = json.load(f)
+        else:
+            previous_manifest = None
+        if previous_manifest != manifest:
+            for chunk_path in glob.glob(os.path.join(checkpoint_dir, "chunk_*.parquet*")):
+                os.remove(chunk_path)
+            with open(manifest_file, "w") as f:
+                json.dump(manifest, f)
+
+        # Only submit the chunks that have not been finished
+        chunk_list = [(num, os.path.join(checkpoint_dir, f"chunk_{num:05d}.parquet"))
+                      for num in range(0, -(-len(population) // chunk_size))]
+        pending = [(num, chunk_path) for num, chunk_path in chunk_list if not os.path.exists(chunk_path)]
+        logger = logging.getLogger(__name__)
+        logger.info("%d of %d chunks already finished", len(chunk_list) - len(pending), len(chunk_list))
+
+        # Fan out the pending chunks to the process pool, spawned as a forked worker hang when polars was used before
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(batch._match_chunk, chunk_path,
+                                       population.iloc[num * chunk_size:(num + 1) * chunk_size].copy(), gp_df,
+                                       df1_lat, df1_lon, df2_lat, df2_lon, column_to_match, distance_column)
+                       for num, chunk_path in pending]
+            for count, future in enumerate(as_completed(futures), start=1):
+                logger.info("Finished %s (%d/%d)", os.path.basename(future.result()), count, len(pending))
+
+        # Combine all the chunks in order and write the final output
+        df = pd.concat([pd.read_parquet(chunk_path) for _, chunk_path in chunk_list], ignore_index=True)
+        df.to_parquet(output_file, engine="pyarrow")
+        timing.attach(output_file)
+
+        # Return the dataframe
+        return df
+
+    def main(argv:list|None = None) -> None:
+        # Import necessary packages
+        import argparse
+        import logging
+
+        # Prepare the command line options, default to the paths in spm.file
+        parser = argparse.ArgumentParser(description="Match the nearest GP for every grid point in chunks with checkpoint")
+        parser.add_argument("--grid-file", default=file._population_str_ascii_gp_households)
+        parser.add_argument("--gp-file", default=file._full_gp_file)
+        parser.add_argument("--output-file", default=file._population_ascii_all_gp)
+        parser.add_argument("--checkpoint-dir", default=file._checkpoint_nearest)
+        parser.add_argument("--chunk-size", type=int, default=batch._chunk_size)
+        parser.add_argument("--max-workers", type=int, default=None)
+        args = parser.parse_args(argv)
+
+        # Show the progress of the chunks on the command line
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+        # Run the batch, rerun with the same arguments will resume from the finished chunks
+        batch.run_nearest(grid_file=args.grid_file,
+                          gp_file=args.gp_file,
+                          output_file=args.output_file,
+                          checkpoint_dir=args.checkpoint_dir,
+                          chunk_size=args.chunk_size,
+                          max_workers=args.max_workers)
+
+if __name__ == "__main__":
+    batch.main()
@@ -0,0 +1,118 @@
+from .file import file
+import numpy as np
+
+class boundary:
+    # Simplify tolerance and coordinate decimal places in degree for each mapbox zoom level, about one pixel up to zoom 7 and half
+    # a pixel after that. A pixel is 0.044 degree at zoom 5, so 2 decimal places is already within a quarter of it
+    _zoom_tolerance = {4:0.06, 6:0.02, 8:0.0025, 10:0.0006}
+    _zoom_decimal = {4:2, 6:2, 8:4, 10:5}
+    # Memory cache of the simplified geojson
+    _memory = {}
+
+    def zoom_level(zoom:int|float|None) -> int|None:
+        # No zoom or zoom in more than the last level will use the full resolution file
+        if zoom is None or zoom > max(boundary._zoom_tolerance) + 1:
+            return None
+
+        # Use the nearest level that is not more detail than the zoom
+        return max([level for level in boundary._zoom_tolerance if level <= zoom], default=min(boundary._zoom_tolerance))
+
+    def remember(key:tuple,
+                 geojson_data:dict) -> None:
+        # Forget the older version of the same file and level before keeping the new one
+        for old_key in [old_key for old_key in boundary._memory if old_key[0] == key[0] and old_key[3] == key[3]]:
+            del boundary._memory[old_key]
+        boundary._memory[key] = geojson_data
+
+    def drop_small_parts(geometry,
+                         min_area:float):
+        # Import necessary packages
+        import shapely
+
+        # Nothing to drop for an empty or single polygon
+        parts = shapely.get_parts(geometry)
+        if len(parts) <= 1:
+            return geometry
+        area = shapely.area(parts)
+        keep = (area >= min_area) | (area == area.max())
+
+        # Return as polygon when only one part is left
+        return parts[keep][0] if keep.sum() == 1 else shapely.multipolygons(parts[keep])
+
+    def polygonal(geometry):
+        # Import necessary packages
+        import shapely
+
+        # Keep only the polygon of the geometry fixed by make_valid, the collapsed line or point cannot be drawn as area
+        parts = shapely.get_parts(geometry)
+        parts = parts[shapely.get_type_id(parts) == shapely.GeometryType.POLYGON]
+        if len(parts) == 0:
+            return shapely.Polygon()
+
+        # Return as polygon when only one part is left
+        return parts[0] if len(parts) == 1 else shapely.multipolygons(parts)
+
+    def simplify(map_file:str,
+                 tolerance:float,
+                 decimal:int) -> dict:
+        # Import necessary packages
+        import geopandas as gpd
+        import shapely
+
+        # Read the polygon, buffer 0 to fix the invalid ring before simplify
+        df = gpd.read_file(map_file)
+        geometry = shapely.buffer(df.geometry.values, 0)
+
+        # Simplify the shared border once for both polygon so there is no gap or overlap between neighbours
+        try:
+            geometry = shapely.coverage_simplify(geometry, tolerance)
+        except (AttributeError, shapely.errors.GEOSException):
+            geometry = shapely.simplify(geometry, tolerance, preserve_topology=True)
+
+        # Drop the island smaller than a square of the tolerance, it is no more than a pixel, the largest part of each area is kept
+        geometry = np.array([boundary.drop_small_parts(value, tolerance**2) for value in geometry], dtype=object)
+
+        # Round the coordinates as the extra decimal places cannot be seen at that zoom, then fix the ring that now cross itself
+        geometry = shapely.transform(geometry, lambda coords: np.round(coords, decimal))
+        df.geometry = np.array([boundary.polygonal(value) for value in shapely.make_valid(geometry, method="structure", keep_collapsed=False)],
+                               dtype=object)
+
+        # Return the geojson as dictionary
+        return df.to_geo_dict(drop_id=True)
+
+    def read_geojson(map_file:str,
+                     zoom:int|float|None = None,
+                     cache_dir:str = file._cache_boundary) -> dict:
+        # Import necessary packages
+        import json
+        import os
+
+        # The full resolution file is read as it is
+        level = boundary.zoom_level(zoom)
+        stat = os.stat(map_file)
+        key = (os.path.abspath(map_file), stat.st_mtime_ns, stat.st_size, level)
+        if key in boundary._memory:
+            return boundary._memory[key]
+        if level is None:
+            with open(map_file) as f:
+                geojson_data = json.load(f)
+            boundary.remember(key, geojson_data)
+            return geojson_data
+
+        # The disk cache is keyed on the content of the boundary file, the zoom level and its tolerance and decimal places
+        tolerance, decimal = boundary._zoom_tolerance[level], boundary._zoom_decimal[level]
+        cache_file = os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(map_file))[0]}_{file.content_hash(map_file)}"
+                                             f"_z{level}_t{tolerance:g}_d{decimal}.geojson")
+        if os.path.exists(cache_file):
+            with open(cache_file) as f:
+                geojson_data = json.load(f)
+        else:
+            geojson_data = boundary.simplify(map_file, tolerance, decimal)
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(f"{cache_file}.tmp", "w") as f:
+                json.dump(geojson_data, f, separators=(",", ":"))
+            os.replace(f"{cache_file}.tmp", cache_file)
+
+        # Keep in memory for the next call and return
+        boundary.remember(key, geojson_data)
+        return geojson_data
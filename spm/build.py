@@ -0,0 +1,345 @@
+from .file import file
+from .timing import timing
+import os
+
+class build:
+    # Manifest of the last build of each stage, with the hash of its inputs and outputs
+    _manifest_dir = file._cache_build
+    _max_workers = 4
+    # Column of each file read by the pages, in order, the stage fail instead of writing a file of another shape
+    _households_columns = ["X", "Y", "Z", "state", "code_parlimen", "parlimen", "code_state_district", "district", "estimated_str"]
+    _gp_households_columns = ["lat", "lon", "Z", "state", "code_parlimen", "parlimen", "code_state_district", "district", "area",
+                              "estimated_str", "id", "Latitude", "Longitude", "distance"]
+
+    def gp_file() -> str:
+        # The GP list is kept as parquet after refresh, excel before that
+        return file._gp_parquet if os.path.exists(file._gp_parquet) else file._gp_file
+
+    def stages(gp_file:str|None = None) -> dict:
+        # Each stage read only its inputs and write only its outputs, the stage that read the output of another stage run after it
+        # The source of the spm modules used by the stage, and every spm module they import, is part of its key
+        gp_file = build.gp_file() if gp_file is None else gp_file
+        str_inputs = {"str_file":file._file_spm_parquet,
+                      "grid_file":file._population_ascii,
+                      "parlimen_population_file":file._population_parlimen,
+                      "parlimen_file":file._map_parlimen,
+                      "district_file":file._map_district}
+        return {"crosswalk":{"function":build.make_crosswalk,
+                             "inputs":{"grid_file":file._population_ascii,
+                                       "parlimen_file":file._map_parlimen,
+                                       "district_file":file._map_district},
+                             "outputs":{},
+                             "code":["crosswalk.py"]},
+                "str_ascii_parlimen":{"function":build.make_str_ascii,
+                                      "inputs":str_inputs,
+                                      "outputs":{"output_file":file._population_str_ascii_parlimen},
+                                      "params":{"method":"individual"},
+                                      "after":["crosswalk"],
+                                      "code":["population.py"]},
+                "str_ascii_households":{"function":build.make_str_households,
+                                        "inputs":str_inputs,
+                                        "outputs":{"output_file":file._population_str_ascii_households},
+                                        "after":["crosswalk"],
+                                        "code":["population.py"]},
+                "str_ascii_gp_households":{"function":build.make_nearest_gp,
+                                           "inputs":{"str_ascii_file":file._population_str_ascii_households,
+                                                     "gp_file":gp_file,
+                                                     "district_file":file._map_district},
+                                           "outputs":{"output_file":file._population_str_ascii_gp_households},
+                                           "code":["distance.py"]}}
+
+    def make_crosswalk(grid_file:str,
+                       parlimen_file:str,
+                       district_file:str) -> None:
+        # Import necessary packages
+        from .crosswalk import crosswalk
+
+        # Build the crosswalk cache once before the stages that read it run at the same time
+        crosswalk.load(grid_file=grid_file, boundary_files={"parlimen":parlimen_file, "district":district_file})
+
+    def code(name_list:list,
+             code_dir:str|None = None) -> list:
+        # Import necessary packages
+        import ast
+
+        # Follow the relative import of each module, e.g. population import crosswalk which import raster and map
+        code_dir = os.path.dirname(os.path.abspath(__file__)) if code_dir is None else code_dir
+        found, pending = set(), list(name_list)
+        while pending:
+            name = pending.pop()
+            if name in found:
+                continue
+            found.add(name)
+            with open(os.path.join(code_dir, name)) as f:
+                tree = ast.parse(f.read())
+            pending.extend(f"{node.module}.py" for node in ast.walk(tree)
+                           if isinstance(node, ast.ImportFrom) and node.level == 1 and node.module
+                           and os.path.exists(os.path.join(code_dir, f"{node.module}.py")))
+
+        # Return the path of every module in order
+        return [os.path.join(code_dir, name) for name in sorted(found)]
+
+    def write(df,
+              output_file:str,
+              columns:list,
+              unique:list|None = None) -> None:
+        # Import necessary packages
+        import polars as pl
+
+        # Keep the column read by the pages in the same order, and only one row for each grid point
+        df = pl.from_pandas(df) if not isinstance(df, pl.DataFrame) else df
+        missing = [column for column in columns if column not in df.columns]
+        if missing:
+            raise ValueError(f"{output_file} would be written without the column {', '.join(missing)}")
+        df = df.select(columns)
+        if unique is not None and df.select(unique).is_duplicated().any():
+            raise ValueError(f"{output_file} would have more than one row for the same {', '.join(unique)}")
+
+        # Write to temporary file then rename, so the old file is kept if anything fail
+        df.write_parquet(f"{output_file}.tmp")
+        os.replace(f"{output_file}.tmp", output_file)
+
+    def make_str_ascii(method:str,
+                       output_file:str,
+                       **input_files) -> None:
+        # Import necessary packages
+        from .population import population
+
+        # Estimated STR of each grid point by individual, for every date, sex, age and ethnicity of the parlimen population
+        df = population.str_population_ascii(method, **input_files)
+        df.write_parquet(f"{output_file}.tmp")
+        os.replace(f"{output_file}.tmp", output_file)
+
+    def make_str_households(output_file:str,
+                            **input_files) -> None:
+        # Import necessary packages
+        import polars as pl
+        from .crosswalk import crosswalk
+        from .population import population
+
+        # One row for each grid point, the overall population of the year used for the STR percentage
+        df = population.str_population_ascii("households", **input_files)\
+                       .filter(pl.col("date").cast(pl.String) == "2020-01-01",
+                               pl.col("sex") == "both",
+                               pl.col("age") == "overall",
+                               pl.col("ethnicity") == "overall")\
+                       .rename({"str_ascii":"estimated_str"})
+
+        # Parlimen name for the filter of the STR map, by its code
+        parlimen = crosswalk.regions(input_files["parlimen_file"], "parlimen").select("code_parlimen", "parlimen").unique(subset="code_parlimen")
+        df = df.join(parlimen, how="left", on="code_parlimen")
+        build.write(df, output_file, build._households_columns, unique=["X", "Y"])
+
+    def make_nearest_gp(str_ascii_file:str,
+                        gp_file:str,
+                        district_file:str,
+                        output_file:str) -> None:
+        # Import necessary packages
+        import geopandas as gpd
+        import pandas as pd
+        import polars as pl
+        from .distance import distance
+
+        # One row for each grid point from the households file
+        df = pl.read_parquet(str_ascii_file).rename({"X":"lon", "Y":"lat"})
+
+        # Area of each district in km2 for the ann
+        district = gpd.read_file(district_file).to_crs({"proj":"cea"})
+        district = pl.DataFrame({"code_state_district":district.loc[:,"code_state_district"].to_numpy(),
+                                 "area":district.geometry.area.to_numpy() / 10**6})
+        df = df.join(district, how="left", on="code_state_district").to_pandas()
+
+        # Nearest GP of each grid point and the distance to it, in the distance column read by the pages
+        gp_df = pd.read_parquet(gp_file) if gp_file.endswith(".parquet") else pd.read_excel(gp_file)
+        df = distance.match_nearest(df1=df, df1_lat="lat", df1_lon="lon",
+                                    df2=gp_df.loc[:,["id", "Latitude", "Longitude"]], df2_lat="Latitude", df2_lon="Longitude",
+                                    column_to_match="id", distance_column="distance")
+        build.write(df, output_file, build._gp_households_columns, unique=["lat", "lon"])
+
+    def dependencies(stages:dict) -> dict:
+        # A stage depend on the stage that write any of its inputs, and on the stage listed in after
+        writer = {path:name for name, stage in stages.items() for path in stage["outputs"].values()}
+        return {name:sorted({writer[path] for path in stage["inputs"].values() if path in writer and writer[path] != name}
+                            | set(stage.get("after", [])))
+                for name, stage in stages.items()}
+
+    def select(stages:dict,
+               stage_list:list|None = None) -> list:
+        # The chosen stages along with every stage they depend on
+        dependencies = build.dependencies(stages)
+        selected, pending = set(), list(stages if not stage_list else stage_list)
+        while pending:
+            name = pending.pop()
+            if name not in stages:
+                raise KeyError(f"Unknown stage {name}, choose from {', '.join(stages)}")
+            if name not in selected:
+                selected.add(name)
+                pending.extend(dependencies[name])
+
+        # Return in the order of the stages
+        return [name for name in stages if name in selected]
+
+    def key(stage:dict) -> dict:
+        # Hash of each input file, the spm code of the stage and the parameters
+        inputs = {path:file.content_hash(path) for path in stage["inputs"].values()}
+        code = file.content_hash(*build.code(stage.get("code", []) + [os.path.basename(__file__)]))
+
+        # Return the key
+        return {"inputs":inputs, "code":code, "params":stage.get("params", {})}
+
+    def manifest_file(name:str,
+                      manifest_dir:str = _manifest_dir) -> str:
+        # One manifest for each stage
+        return os.path.join(manifest_dir, f"{name}.json")
+
+    def read_manifest(name:str,
+                      manifest_dir:str = _manifest_dir) -> dict|None:
+        # Import necessary packages
+        import json
+
+        # No manifest when the stage was never built
+        try:
+            with open(build.manifest_file(name, manifest_dir)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_manifest(name:str,
+                       stage:dict,
+                       key:dict,
+                       seconds:float,
+                       manifest_dir:str = _manifest_dir) -> str:
+        # Import necessary packages
+        import json
+        from datetime import datetime
+
+        # Record which inputs the outputs were built from
+        manifest = {"stage":name, "key":key, "outputs":{path:file.content_hash(path) for path in stage["outputs"].values()},
+                    "built":datetime.now().isoformat(timespec="seconds"), "seconds":round(seconds, 3)}
+        manifest_file = build.manifest_file(name, manifest_dir)
+        os.makedirs(manifest_dir, exist_ok=True)
+        with open(f"{manifest_file}.tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{manifest_file}.tmp", manifest_file)
+
+        # Return the file path
+        return manifest_file
+
+    def fresh(name:str,
+              stage:dict,
+              key:dict,
+              manifest_dir:str = _manifest_dir) -> bool:
+        # Up to date when the key is the same as the last build and every output is still the one it wrote
+        manifest = build.read_manifest(name, manifest_dir)
+        if manifest is None or manifest["key"] != key:
+            return False
+        return all(os.path.exists(path) and file.content_hash(path) == manifest["outputs"].get(path)
+                   for path in stage["outputs"].values())
+
+    def execute(name:str,
+                stage:dict) -> float:
+        # Import necessary packages
+        import time
+
+        # Run the stage in the worker process, the timing report is kept besides each output when SPM_PROFILE is set
+        start = time.perf_counter()
+        with timing.stage(f"build:{name}"):
+            stage["function"](**stage["inputs"], **stage["outputs"], **stage.get("params", {}))
+        for path in stage["outputs"].values():
+            timing.attach(path)
+
+        # Return the time taken
+        return time.perf_counter() - start
+
+    def run(stage_list:list|None = None,
+            force:bool = False,
+            dry_run:bool = False,
+            max_workers:int = _max_workers,
+            manifest_dir:str = _manifest_dir,
+            stages:dict|None = None) -> dict:
+        # Import necessary packages
+        import logging
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+        # Prepare the stages and the order between them
+        stages = build.stages() if stages is None else stages
+        dependencies = build.dependencies(stages)
+        pending, running, status = build.select(stages, stage_list), {}, {}
+        logger = logging.getLogger(__name__)
+
+        # Spawn the worker, a forked worker hang when polars was used in the calling process, e.g. from the notebook
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            while pending or running:
+                # Start every stage whose dependencies are done, the key is taken only then as its inputs may just be rebuilt
+                ready = [name for name in pending if all(dependency in status for dependency in dependencies[name] if dependency in stages)]
+                for name in ready:
+                    pending.remove(name)
+                    upstream = [status[dependency] for dependency in dependencies[name]]
+                    if any(value in ("failed", "blocked") for value in upstream):
+                        status[name] = "blocked"
+                    elif dry_run and "build" in upstream:
+                        status[name] = "build"
+                    else:
+                        try:
+                            key = build.key(stages[name])
+                        except OSError as error:
+                            status[name] = "failed"
+                            logger.error("Failed   %s: missing input %s", name, error.filename)
+                            continue
+                        if not force and build.fresh(name, stages[name], key, manifest_dir):
+                            status[name] = "skipped"
+                        elif dry_run:
+                            status[name] = "build"
+                        else:
+                            running[executor.submit(build.execute, name, stages[name])] = (name, key)
+                            logger.info("Building %s", name)
+                            continue
+                    logger.log(logging.WARNING if status[name] == "blocked" else logging.INFO, "%-8s %s",
+                               "Would build" if status[name] == "build" else status[name].capitalize(), name)
+                if ready:
+                    continue
+                if not running:
+                    raise RuntimeError(f"Stages {', '.join(pending)} depend on each other")
+
+                # Wait for any running stage, the stage after a failed one is not started
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key = running.pop(future)
+                    try:
+                        seconds = future.result()
+                    except Exception as error:
+                        status[name] = "failed"
+                        logger.error("Failed   %s: %r", name, error)
+                        continue
+                    build.write_manifest(name, stages[name], key, seconds, manifest_dir)
+                    status[name] = "built"
+                    logger.info("Built    %s in %.1fs", name, seconds)
+
+        # Return the status of each stage
+        return status
+
+    def main(argv:list|None = None) -> None:
+        # Import necessary packages
+        import sys
+        import logging
+        import argparse
+
+        # Prepare the command line options
+        parser = argparse.ArgumentParser(prog="python -m spm build", description="Build the derived parquet files whose inputs changed")
+        parser.add_argument("stage", nargs="*", help=f"Stage to build with the stages it depend on, default to all of {', '.join(build.stages())}")
+        parser.add_argument("--force", action="store_true", help="Rebuild even when the inputs are unchanged")
+        parser.add_argument("--dry-run", action="store_true", help="Only show which stage would be built")
+        parser.add_argument("--max-workers", type=int, default=build._max_workers)
+        args = parser.parse_args(argv)
+
+        # Show the status of each stage on the command line
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+        # Run the build, exit with error when any stage failed
+        status = build.run(stage_list=args.stage, force=args.force, dry_run=args.dry_run, max_workers=args.max_workers)
+        if any(value in ("failed", "blocked") for value in status.values()):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    build.main()
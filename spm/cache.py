@@ -0,0 +1,119 @@
+from .file import file
+from collections import OrderedDict
+import threading
+
+class cache:
+    # Memory limit for all cached dataset, the least recently used dataset is removed first
+    _max_bytes = 2 * 1024**3
+    # Seconds before a dataset read from an url is read again
+    _url_ttl = 6 * 60 * 60
+    # One copy per dataset for the whole process, shared by every page and session
+    _store = OrderedDict()
+    _hash_memo = {}
+    _lock = threading.RLock()
+
+    def is_url(source:str) -> bool:
+        # Remote source cannot be checked by mtime
+        return str(source).startswith(("http://", "https://"))
+
+    def source_key(source:str) -> tuple:
+        # Import necessary packages
+        import os
+
+        # Remote source is only keyed on the url, it is expired by time instead
+        if cache.is_url(source):
+            return (source,)
+
+        # Only hash the content again when the mtime or size changed, touching a file without changing it keep the cache
+        path = os.path.abspath(source)
+        stat = os.stat(path)
+        with cache._lock:
+            memo = cache._hash_memo.get(path)
+            if memo is None or memo[:2] != (stat.st_mtime_ns, stat.st_size):
+                memo = (stat.st_mtime_ns, stat.st_size, file.content_hash(path))
+                cache._hash_memo[path] = memo
+
+        # Return the path with its content hash
+        return (path, memo[2])
+
+    def frame_size(obj) -> int:
+        # Import necessary packages
+        from .memory import memory
+
+        # Estimate the memory of the dataframe, or each item of the tuple returned by the loader
+        return memory.frame_size(obj)["total"]
+
+    def copy(value):
+        # Import necessary packages
+        import pandas as pd
+
+        # Own copy of the pandas dataframe for each caller, as st.cache_data, so a change in place does not reach the cache
+        # Polars dataframe cannot be changed in place, it is shared
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return value.copy()
+        if isinstance(value, tuple):
+            return tuple(cache.copy(item) for item in value)
+        if isinstance(value, list):
+            return [cache.copy(item) for item in value]
+        if isinstance(value, dict):
+            return {key:cache.copy(item) for key, item in value.items()}
+        return value
+
+    def evict(max_bytes:int|None = None) -> None:
+        # Remove the least recently used dataset until the total size is within the limit, always keep the newest one
+        max_bytes = cache._max_bytes if max_bytes is None else max_bytes
+        with cache._lock:
+            while len(cache._store) > 1 and sum(entry["size"] for entry in cache._store.values()) > max_bytes:
+                cache._store.popitem(last=False)
+
+    def clear() -> None:
+        # Remove every cached dataset
+        with cache._lock:
+            cache._store.clear()
+            cache._hash_memo.clear()
+
+    def load(sources:tuple,
+             loader,
+             *args,
+             ttl:int|float|None = None,
+             **kwargs):
+        # Import necessary packages
+        import time
+
+        # Key on the loader, its arguments and the current state of every source file
+        ttl = cache._url_ttl if ttl is None else ttl
+        name = (getattr(getattr(loader, "__code__", None), "co_filename", loader.__module__), loader.__qualname__,
+                repr(args), repr(sorted(kwargs.items())))
+        key = (name, tuple(cache.source_key(source) for source in sources))
+        with cache._lock:
+            entry = cache._store.get(key)
+            if entry is not None and (entry["expire"] is None or entry["expire"] > time.time()):
+                cache._store.move_to_end(key)
+                return cache.copy(entry["value"])
+
+        # Read the dataset outside of the lock so other dataset can still be read
+        value = loader(*args, **kwargs)
+        expire = time.time() + ttl if any(cache.is_url(source) for source in sources) else None
+
+        # Keep one copy, drop the older version of the same loader and arguments
+        with cache._lock:
+            for old_key in [old_key for old_key in cache._store if old_key[0] == name]:
+                del cache._store[old_key]
+            cache._store[key] = {"value":value, "size":cache.frame_size(value), "expire":expire}
+        cache.evict()
+
+        # Return a copy of the dataset, the cached one is kept as read
+        return cache.copy(value)
+
+    def cached(*sources:str,
+               ttl:int|float|None = None):
+        # Import necessary packages
+        import functools
+
+        # Decorator for the data loader, e.g. @cache.cached(file._gp_file, file._full_gp_file)
+        def decorator(loader):
+            @functools.wraps(loader)
+            def wrapper(*args, **kwargs):
+                return cache.load(sources, loader, *args, ttl=ttl, **kwargs)
+            return wrapper
+        return decorator
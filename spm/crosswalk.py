@@ -0,0 +1,101 @@
+from .file import file
+from .map import map
+from .raster import raster
+from .grid import grid
+from .timing import timing
+import polars as pl
+
+class crosswalk:
+    # Boundary files for each level, the crosswalk keep the position of the feature in each file as the id
+    _boundary_files = {
+        "state":file._map_state,
+        "district":file._map_district,
+        "parlimen":file._map_parlimen,
+        "dun":file._map_dun
+    }
+    # Column that hold the code of the region for each level
+    _code_column = {
+        "state":"code_state",
+        "district":"code_state_district",
+        "parlimen":"code_parlimen",
+        "dun":"code_state_dun"
+    }
+
+    def regions(map_file:str,
+                level:str) -> pl.DataFrame:
+        # Read the properties of each feature without the geometry, row position is the feature id
+        return pl.DataFrame([feature["properties"] for feature in map.read_geojson_file(map_file)["features"]])\
+                 .with_row_index(f"{level}_id")\
+                 .with_columns(pl.col(f"{level}_id").cast(pl.Int32))
+
+    def read_grid(grid_file:str) -> pl.DataFrame:
+        # Read the WorldPop XYZ grid through its parquet copy, row position is the cell id
+        return grid.scan(grid_file).collect()
+
+    def build(grid_file:str = file._population_ascii,
+              boundary_files:dict = _boundary_files) -> pl.DataFrame:
+        # Prepare the grid
+        df = crosswalk.read_grid(grid_file).select("cell", "X", "Y")
+        x, y = df["X"].to_numpy(), df["Y"].to_numpy()
+
+        # Look up each boundary on its label raster, only the point near the border need the exact polygon test
+        for level, map_file in boundary_files.items():
+            with timing.stage(f"crosswalk.build:{level}", rows_in=len(x)):
+                region_id = raster.lookup(x, y, raster.label_grid(map_file, x, y))
+                df = df.with_columns(pl.Series(f"{level}_id", region_id, dtype=pl.Int32).replace(raster._outside, None))
+
+        # Return the crosswalk
+        return df
+
+    def cache_file(grid_file:str = file._population_ascii,
+                   boundary_files:dict = _boundary_files,
+                   cache_dir:str = file._cache_crosswalk) -> str:
+        # Import necessary packages
+        import os
+
+        # The cache is keyed on the content of the grid and every boundary file
+        key = file.content_hash(grid_file, *boundary_files.values())
+        return os.path.join(cache_dir, f"crosswalk_{'_'.join(boundary_files.keys())}_{key}.parquet")
+
+    def load(grid_file:str = file._population_ascii,
+             boundary_files:dict = _boundary_files,
+             cache_dir:str = file._cache_crosswalk) -> pl.DataFrame:
+        # Import necessary packages
+        import os
+
+        # Only build the crosswalk when any of the input changed
+        cache_file = crosswalk.cache_file(grid_file, boundary_files, cache_dir)
+        if os.path.exists(cache_file):
+            return pl.read_parquet(cache_file)
+        df = crosswalk.build(grid_file, boundary_files)
+
+        # Write to temporary file then rename to prevent half written cache
+        os.makedirs(cache_dir, exist_ok=True)
+        df.write_parquet(f"{cache_file}.tmp")
+        os.replace(f"{cache_file}.tmp", cache_file)
+
+        # Return the crosswalk
+        return df
+
+    def scan(grid_file:str = file._population_ascii,
+             region:dict|None = None,
+             boundary_files:dict|None = None,
+             cache_dir:str = file._cache_crosswalk) -> pl.LazyFrame:
+        # Import necessary packages
+        import os
+
+        # Make sure the crosswalk is built, then scan it lazily
+        boundary_files = crosswalk._boundary_files if boundary_files is None else boundary_files
+        cache_file = crosswalk.cache_file(grid_file, boundary_files, cache_dir)
+        if not os.path.exists(cache_file):
+            crosswalk.load(grid_file, boundary_files, cache_dir)
+        df = pl.scan_parquet(cache_file)
+
+        # Filter by the region code of each level, e.g. {"district": ["14_1"], "parlimen": ["P.117"]}
+        for level, codes in (region or {}).items():
+            region_id = crosswalk.regions(boundary_files[level], level)\
+                                 .filter(pl.col(crosswalk._code_column[level]).is_in(codes))[f"{level}_id"]
+            df = df.filter(pl.col(f"{level}_id").is_in(region_id.implode()))
+
+        # Return the lazy frame
+        return df
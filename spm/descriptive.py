@@ -1,10 +1,62 @@
 import polars as pl
 import numpy as np
-from scipy.stats import skew, kurtosis, shapiro, norm, spearmanr, iqr
 
 class descriptive:
     _summary_column_name = ["District Name", "Count of Points", "Mean", "Standard Deviation", "Min", "Max", "Median", "Inter-Quarter Range", "Skew", "Kurtosis", "shapiro"]
-    _summary_function_list = [len, np.mean, np.std, min, max, np.median, iqr, skew, kurtosis, shapiro]
+    # Display name for each column of summary, in the same order as _summary_column_name
+    _summary_display_name = {"count":"Count of Points", "mean":"Mean", "std":"Standard Deviation", "min":"Min", "max":"Max",
+                             "median":"Median", "iqr":"Inter-Quarter Range", "skew":"Skew", "kurtosis":"Kurtosis",
+                             "shapiro_stat":"Shapiro Stats", "shapiro_p_value":"Shapiro p value",
+                             "jarque_bera_stat":"Jarque-Bera Stats", "jarque_bera_p_value":"Jarque-Bera p value"}
+
+    def summary(df:pl.DataFrame,
+                column:str,
+                group_by:str|list|None = None,
+                normality:str|None = "shapiro",
+                total:bool = True) -> pl.DataFrame:
+        # Import necessary packages
+        import pandas as pd
+        from scipy.stats import chi2, shapiro
+
+        # Accept pandas as well, the summary is cached by the caller with the data it is computed from
+        group_by = [] if group_by is None else [group_by] if isinstance(group_by, str) else list(group_by)
+        df = pl.from_pandas(df) if isinstance(df, pd.DataFrame) else df
+
+        # Same definition as np.std and scipy iqr, skew and kurtosis, population std, linear iqr, biased skew and fisher kurtosis
+        expression_list = [pl.col(column).count().alias("count"),
+                           pl.col(column).mean().alias("mean"),
+                           pl.col(column).std(ddof=0).alias("std"),
+                           pl.col(column).min().alias("min"),
+                           pl.col(column).max().alias("max"),
+                           pl.col(column).median().alias("median"),
+                           (pl.col(column).quantile(0.75, interpolation="linear") - pl.col(column).quantile(0.25, interpolation="linear")).alias("iqr"),
+                           pl.col(column).skew().alias("skew"),
+                           pl.col(column).kurtosis().alias("kurtosis")]
+        # Shapiro cannot be written as expression, so keep the values of each group for it
+        if normality == "shapiro":
+            expression_list.append(pl.col(column).drop_nulls().implode().alias("_values"))
+
+        # Group by the keys, and add the total of all groups in the same query
+        query_list = []
+        if total or not group_by:
+            query_list.append(df.lazy().select([pl.lit(f"{df[key].n_unique()} {key.capitalize()}s").alias(key) for key in group_by] + expression_list))
+        if group_by:
+            grouped = df.lazy().group_by(group_by).agg(expression_list).sort(group_by)
+            query_list.append(grouped.with_columns(pl.col(group_by).cast(pl.String)) if total else grouped)
+        result = pl.concat(query_list, how="vertical_relaxed").collect()
+
+        # Normality test, Jarque-Bera is from the skew and kurtosis directly
+        if normality == "shapiro":
+            shapiro_list = [shapiro(values) if len(values) >= 3 else (np.nan, np.nan) for values in result["_values"].to_list()]
+            result = result.drop("_values")\
+                           .with_columns(pl.Series("shapiro_stat", [float(value[0]) for value in shapiro_list], dtype=pl.Float64),
+                                         pl.Series("shapiro_p_value", [float(value[1]) for value in shapiro_list], dtype=pl.Float64))
+        elif normality == "jarque_bera":
+            result = result.with_columns((pl.col("count") / 6 * (pl.col("skew") ** 2 + pl.col("kurtosis") ** 2 / 4)).alias("jarque_bera_stat"))
+            result = result.with_columns(pl.Series("jarque_bera_p_value", chi2.sf(result["jarque_bera_stat"].to_numpy(), 2)))
+
+        # Return the summary
+        return result
 
     def pivot_with_percentage(df:pl.DataFrame,
                               columns:str,
@@ -1,12 +1,17 @@
 import pandas as pd
 
 class distance:
-    def haversine(lat1:float, lon1:float, lat2:float, lon2:float) -> float:
+    # Earth radius in kilometers and the memory ceiling for each pairwise block
+    _earth_radius_km = 6371.0
+    _max_chunk_bytes = 256 * 1024**2
+
+    def haversine(lat1, lon1, lat2, lon2):
         # Import impoartant packages
         import numpy as np
 
-        # Earth radius in kilometers
-        R = 6371.0 
+        # Accept float, list, numpy, pandas, polars or arrow array
+        lat1, lon1 = np.asarray(lat1, dtype=np.float64), np.asarray(lon1, dtype=np.float64)
+        lat2, lon2 = np.asarray(lat2, dtype=np.float64), np.asarray(lon2, dtype=np.float64)
 
         # Find the radians for both lat and lon
         lat1_rad, lon1_rad = np.radians(lat1), np.radians(lon1)
@@ -21,11 +26,84 @@ class distance:
         c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
 
         # Times the earth radius to become km in difference
-        distance = R * c
+        return distance._earth_radius_km * c
+
+    def haversine_pairwise(lat1, lon1, lat2, lon2):
+        # Import impoartant packages
+        import numpy as np
+
+        # Broadcast the first points as rows and second points as columns to get (n, m) matrix
+        return distance.haversine(np.asarray(lat1, dtype=np.float64)[:, None], np.asarray(lon1, dtype=np.float64)[:, None],
+                                  np.asarray(lat2, dtype=np.float64)[None, :], np.asarray(lon2, dtype=np.float64)[None, :])
+
+    def haversine_chunks(lat1, lon1, lat2, lon2,
+                         max_bytes:int = _max_chunk_bytes):
+        # Import impoartant packages
+        import numpy as np
+
+        # Prepare the arrays
+        lat1, lon1 = np.asarray(lat1, dtype=np.float64), np.asarray(lon1, dtype=np.float64)
+        lat2, lon2 = np.asarray(lat2, dtype=np.float64), np.asarray(lon2, dtype=np.float64)
+
+        # Few temporary float64 arrays of the block size are alive during the formula, so keep the rows under the ceiling
+        chunk_rows = max(1, int(max_bytes // (8 * 8 * max(len(lat2), 1))))
+
+        # Yield the start, stop and the distance block of rows[start:stop] against all the second points
+        for start in range(0, len(lat1), chunk_rows):
+            stop = min(start + chunk_rows, len(lat1))
+            yield start, stop, distance.haversine_pairwise(lat1[start:stop], lon1[start:stop], lat2, lon2)
+
+    def to_unit_sphere(lat, lon):
+        # Import important packages
+        import numpy as np
+
+        # Radians both lat and lon
+        lat_rad = np.radians(np.asarray(lat, dtype=np.float64))
+        lon_rad = np.radians(np.asarray(lon, dtype=np.float64))
+
+        # Project onto the unit sphere, straight line (chord) distance will follow the same order as great circle distance
+        return np.column_stack((np.cos(lat_rad) * np.cos(lon_rad),
+                                np.cos(lat_rad) * np.sin(lon_rad),
+                                np.sin(lat_rad)))
+
+    def build_tree(lat, lon):
+        # Import important packages
+        from scipy.spatial import cKDTree
+
+        # Build the KD-tree on the unit sphere coordinates
+        return cKDTree(distance.to_unit_sphere(lat, lon))
+
+    def nearest(df1:pd.DataFrame,
+                df1_lat:str,
+                df1_lon:str,
+                df2:pd.DataFrame,
+                df2_lat:str,
+                df2_lon:str,
+                column_to_match:str|None = None,
+                tree = None,
+                workers:int = -1) -> tuple:
+        # Import important packages
+        import numpy as np
+
+        # Prepare the lat lon as numpy array, work for both pandas and polars dataframe
+        lat1, lon1 = np.asarray(df1[df1_lat], dtype=np.float64), np.asarray(df1[df1_lon], dtype=np.float64)
+        lat2, lon2 = np.asarray(df2[df2_lat], dtype=np.float64), np.asarray(df2[df2_lon], dtype=np.float64)
+
+        # Build the tree for the second dataframe if not provided
+        if tree is None:
+            tree = distance.build_tree(lat2, lon2)
+
+        # Query every point of the first dataframe in one call
+        _, index = tree.query(distance.to_unit_sphere(lat1, lon1), k=1, workers=workers)
+
+        # Calculate the distance in km with the same haversine formula as before
+        distance_km = distance.haversine(lat1, lon1, lat2[index], lon2[index])
+
+        # Return the position in second dataframe if no column to match, else return the matched id
+        if column_to_match is None:
+            return index, distance_km
+        return np.asarray(df2[column_to_match])[index], distance_km
 
-        # Return the value
-        return distance
-    
     def match_nearest(df1:pd.DataFrame, 
                       df1_lat:str, 
                       df1_lon:str, 
@@ -34,21 +112,18 @@ class distance:
                       df2_lon:str, 
                       column_to_match:str,
                       distance_column:str="distance_km") -> pd.DataFrame:
-        # Define the loop for the second dataframe first
-        def find_nearest(lat, lon):
-            # Imagine to have a lat lon that will apply throughout the second dataframe's lat lon
-            distance = df2.apply(lambda row: distance.haversine(lat, lon, row[df2_lat], row[df2_lon]), axis=1)
-            # Return the column to match based on shortest distance
-            return df2.loc[distance.idxmin(), column_to_match]
-        
-        # By looping the first dataframe and then apply the function to loop the second dataframe
-        df1.loc[:,column_to_match] = df1.apply(lambda row: find_nearest(row[df1_lat], row[df1_lon]), axis=1)
+        # Find the nearest id of second dataframe for every point of first dataframe with the KD-tree
+        matched_id, _ = distance.nearest(df1, df1_lat, df1_lon,
+                                         df2, df2_lat, df2_lon,
+                                         column_to_match=column_to_match)
+        df1.loc[:,column_to_match] = matched_id
 
         # Merge the first and second dataframe together
         df = df1.merge(df2, how="left", on=column_to_match)
 
         # Calculate the difference between the both match
-        df.loc[:,distance_column] = df.apply(lambda row: gp.haversine(lat1 = row[df1_lat], lon1 = row[df1_lon], lat2 = row[df2_lat], lon2 = row[df2_lon]), axis = 1)
+        df.loc[:,distance_column] = distance.haversine(lat1 = df.loc[:,df1_lat].to_numpy(), lon1 = df.loc[:,df1_lon].to_numpy(),
+                                                       lat2 = df.loc[:,df2_lat].to_numpy(), lon2 = df.loc[:,df2_lon].to_numpy())
 
         # Return the dataframe
         return df
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+import threading
+
+class figure:
+    # Memory limit for all cached figure json, the least recently used figure is removed first
+    _max_bytes = 256 * 1024**2
+    # Figure for each widget state, and the base figure of each map type and style whose data is swapped on a filter change
+    _store = OrderedDict()
+    _base = OrderedDict()
+    _lock = threading.RLock()
+
+    def key(*parts,
+            sources:tuple = ()) -> tuple:
+        # Import necessary packages
+        from .cache import cache
+
+        # The order of a multiselect does not change the figure, and the figure is stale once any source file changed
+        parts = tuple(tuple(sorted(map(str, part))) if isinstance(part, (list, tuple, set)) else part for part in parts)
+        return (parts, tuple(cache.source_key(source) for source in sources))
+
+    def evict(store:OrderedDict,
+              max_bytes:int|None = None) -> None:
+        # Remove the least recently used figure until the total size is within the limit, always keep the newest one
+        max_bytes = figure._max_bytes if max_bytes is None else max_bytes
+        with figure._lock:
+            while len(store) > 1 and sum(len(value) for value in store.values()) > max_bytes:
+                store.popitem(last=False)
+
+    def clear() -> None:
+        # Remove every cached figure
+        with figure._lock:
+            figure._store.clear()
+            figure._base.clear()
+
+    def get(key:tuple,
+            store:OrderedDict|None = None):
+        # Import necessary packages
+        import plotly.io as pio
+
+        # A new figure from the json each time, so the cached one is never changed by the caller
+        store = figure._store if store is None else store
+        with figure._lock:
+            value = store.get(key)
+            if value is None:
+                return None
+            store.move_to_end(key)
+        return pio.from_json(value)
+
+    def put(key:tuple,
+            fig,
+            store:OrderedDict|None = None):
+        # Keep the figure as json, the base and the full figure share the same limit each
+        store = figure._store if store is None else store
+        value = fig.to_json()
+        with figure._lock:
+            store[key] = value
+            store.move_to_end(key)
+        figure.evict(store)
+
+        # Return the figure
+        return fig
+
+    def update(fig,
+               trace:int = 0,
+               **values):
+        # Swap the data array of the trace, e.g. z and locations, the geometry and layout of the figure is kept
+        fig.data[trace].update(**values)
+        return fig
+
+    def load(key:tuple,
+             builder):
+        # Figure of the widget state, built and kept on the first use
+        fig = figure.get(key)
+        return figure.put(key, builder()) if fig is None else fig
+
+    def partial(key:tuple,
+                base_key:tuple,
+                builder,
+                trace:int = 0,
+                **values):
+        # Same widget state as before
+        fig = figure.get(key)
+        if fig is not None:
+            return fig
+
+        # Only the filter changed, reuse the base figure with its geometry and replace the data of the trace
+        fig = figure.get(base_key, figure._base)
+        if fig is not None:
+            return figure.put(key, figure.update(fig, trace, **values))
+
+        # New map type or style, build the figure and keep it as the base for the next filter
+        fig = builder()
+        figure.put(base_key, fig, figure._base)
+        return figure.put(key, fig)
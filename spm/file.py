@@ -2,6 +2,7 @@ class file:
     # GP File
     _gp_file = "data/information/gp_list.xlsx"
     _full_gp_file = "data/information/private_medical_gp.xlsx"
+    _gp_parquet = "data/information/gp_list.parquet"
     
     # Map File
     _map_malaysia = "data/map/administrative_0_malaysia.geojson"
@@ -15,17 +16,48 @@ class file:
     _population_dun = "data/information/Population DUN.parquet"
     _population_parlimen = "data/information/Population Parlimen.parquet"
     _population_district = "data/information/population_district.parquet"
+    _population_district_url = "https://storage.dosm.gov.my/population/population_district.parquet"
     _population_state = "data/information/population_state.parquet"
     # _population_malaysia = "data/information/Malaysia Population Table.parquet"
     # _population_str_parlimen_district = "data/population/parlimen_district_str.parquet"
     _population_str_ascii_parlimen = "data/information/str_ascii_parlimen.parquet"
     _population_str_ascii_households = "data/information/str_ascii_household.parquet"
     _population_str_ascii_gp_households = "data/information/ascii_household_and_gp.parquet"
+    _population_ascii_all_gp = "data/information/ascii_all_gp.parquet"
+
+    # STR database
+    _file_spm_parquet = "data/information/spm_full.parquet"
+
+    # Checkpoint
+    _checkpoint_nearest = "data/checkpoint/nearest_gp"
+
+    # Cache
+    _cache_crosswalk = "data/cache/crosswalk"
+    _cache_raster = "data/cache/raster"
+    _cache_boundary = "data/cache/boundary"
+    _cache_geocode = "data/cache/geocode.sqlite"
+    _cache_service_area = "data/cache/service_area"
+    _cache_build = "data/cache/build"
 
     # Census
     _census_dun = "data/information/Census Dun.csv"
     _hies_district = "data/information/Household Income Districts.parquet"
-    
 
-    
+    def content_hash(*paths:str,
+                     block_size:int = 2**20) -> str:
+        # Import necessary packages
+        import hashlib
+
+        # Hash the content of every file in order, so renaming or touching a file does not change the hash
+        digest = hashlib.blake2b(digest_size=16)
+        for path in paths:
+            file_digest = hashlib.blake2b(digest_size=16)
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(block_size), b""):
+                    file_digest.update(block)
+            digest.update(file_digest.digest())
+
+        # Return the hex digest
+        return digest.hexdigest()
+
     
\ No newline at end of file
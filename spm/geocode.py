@@ -0,0 +1,127 @@
+from .file import file
+import numpy as np
+import pandas as pd
+
+class geocode:
+    # Number of address geocoded before the result is written to the cache, an interrupted run lose at most one batch
+    _batch_size = 25
+    # Nominatim allow one request per second
+    _user_agent = "str_address_geocoding"
+    _min_delay_seconds = 1
+
+    def normalize(address:str) -> str:
+        # Import necessary packages
+        import re
+
+        # Same address written with different case, spacing or comma is geocoded once
+        address = re.sub(r"\s*,\s*", ", ", str(address).strip().lower())
+        return re.sub(r"\s+", " ", address).strip(" ,.")
+
+    def nominatim(user_agent:str = _user_agent,
+                  min_delay_seconds:float = _min_delay_seconds):
+        # Import necessary packages
+        from geopy.geocoders import Nominatim
+        from geopy.extra.rate_limiter import RateLimiter
+
+        # Rate limited Nominatim, error such as timeout, rate limit or server error is raised instead of returned as not found,
+        # so the address is not cached as not found and is tried again next run
+        geocoder = RateLimiter(Nominatim(user_agent=user_agent).geocode, min_delay_seconds=min_delay_seconds, max_retries=0,
+                               swallow_exceptions=False)
+
+        def backend(address:str) -> tuple|None:
+            location = geocoder(address)
+            return (location.latitude, location.longitude) if location else None
+
+        # Return the backend
+        return backend
+
+    def table(df:pd.DataFrame,
+              address_col:str = "address",
+              lat:str = "Latitude",
+              lon:str = "Longitude"):
+        # Offline backend from a table of known address, e.g. the last gp_list or a fixture
+        lookup = {geocode.normalize(address):(latitude, longitude)
+                  for address, latitude, longitude in zip(df[address_col], df[lat], df[lon])
+                  if pd.notna(latitude) and pd.notna(longitude)}
+
+        def backend(address:str) -> tuple|None:
+            return lookup.get(geocode.normalize(address))
+
+        # Return the backend
+        return backend
+
+    def connect(cache_file:str = file._cache_geocode) -> "sqlite3.Connection":
+        # Import necessary packages
+        import os
+        import sqlite3
+
+        # Not found address is kept as well with found = 0, so it is not looked up every run
+        os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+        connection = sqlite3.connect(cache_file)
+        connection.execute("""CREATE TABLE IF NOT EXISTS geocode (
+                                  address TEXT PRIMARY KEY,
+                                  latitude REAL,
+                                  longitude REAL,
+                                  found INTEGER NOT NULL,
+                                  updated TEXT NOT NULL)""")
+
+        # Return the connection
+        return connection
+
+    def lookup(addresses,
+               backend = None,
+               cache_file:str = file._cache_geocode,
+               batch_size:int = _batch_size,
+               retry_missing:bool = False) -> pd.DataFrame:
+        # Import necessary packages
+        import logging
+        import warnings
+        from datetime import datetime
+
+        # Only geocode each normalized address once
+        backend = geocode.nominatim() if backend is None else backend
+        address_list = pd.Series(list(addresses), dtype=object).dropna().map(geocode.normalize).unique().tolist()
+
+        with geocode.connect(cache_file) as connection:
+            # Skip the address in the cache, and also the not found address unless retry_missing
+            cached = pd.read_sql_query("SELECT address, latitude, longitude, found FROM geocode", connection)
+            cached = cached.loc[cached.loc[:,"address"].isin(address_list)]
+            done = set(cached.loc[cached.loc[:,"found"] == 1, "address"] if retry_missing else cached.loc[:,"address"])
+            pending = [address for address in address_list if address not in done]
+            logger = logging.getLogger(__name__)
+            logger.info("%d of %d addresses found in the geocode cache", len(address_list) - len(pending), len(address_list))
+
+            # Geocode in batch and write each batch, rerun after interruption continue from the last batch
+            # The address that raised is not written to the cache, so it is tried again next run
+            failed = {}
+            for start in range(0, len(pending), batch_size):
+                result_list = []
+                for address in pending[start:start + batch_size]:
+                    try:
+                        location = backend(address)
+                    except Exception as error:
+                        failed[address] = repr(error)
+                        continue
+                    result_list.append((address, *(location if location else (None, None)), int(location is not None),
+                                        datetime.now().isoformat(timespec="seconds")))
+                connection.executemany("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)", result_list)
+                connection.commit()
+                logger.info("Geocoded %d/%d addresses", min(start + batch_size, len(pending)), len(pending))
+
+            # Read back every requested address
+            result = pd.read_sql_query("SELECT address, latitude, longitude, found FROM geocode", connection)
+        connection.close()
+
+        # The failed address is returned as not found with its error, and the count of each outcome is kept in attrs
+        result = result.loc[result.loc[:,"address"].isin(address_list)].assign(error=None)
+        result = pd.concat([result, pd.DataFrame({"address":list(failed), "latitude":np.nan, "longitude":np.nan, "found":0,
+                                                  "error":list(failed.values())})],
+                           ignore_index=True) if failed else result.reset_index(drop=True)
+        result.attrs["counts"] = {"requested":len(address_list), "cached":len(address_list) - len(pending),
+                                  "geocoded":len(pending) - len(failed), "failed":len(failed)}
+        if failed:
+            warnings.warn(f"{len(failed)} of {len(pending)} addresses failed to geocode and will be tried again next run, "
+                          f"e.g. {next(iter(failed))}: {next(iter(failed.values()))}", RuntimeWarning, stacklevel=2)
+
+        # Return the location for each normalized address
+        return result
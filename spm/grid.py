@@ -0,0 +1,63 @@
+from .file import file
+import polars as pl
+
+class grid:
+    # Column type for the WorldPop XYZ file, float32 is enough for the 30 arc-second coordinate
+    _schema = {"X":pl.Float32, "Y":pl.Float32, "Z":pl.Float64}
+    # Small row group so that bounding box filter can skip the row groups by their statistics
+    _row_group_size = 65_536
+
+    def parquet_path(grid_file:str) -> str:
+        # Import necessary packages
+        import os
+
+        # Keep the parquet besides the csv with same name
+        return os.path.splitext(grid_file)[0] + ".parquet"
+
+    def convert(grid_file:str = file._population_ascii,
+                parquet_file:str|None = None,
+                row_group_size:int = _row_group_size) -> str:
+        # Import necessary packages
+        import os
+
+        # Default to the same name as csv
+        parquet_file = grid.parquet_path(grid_file) if parquet_file is None else parquet_file
+
+        # Stream the csv into parquet without loading the whole file, row order is kept so row position is still the cell id
+        pl.scan_csv(grid_file, schema_overrides=grid._schema)\
+          .sink_parquet(f"{parquet_file}.tmp", row_group_size=row_group_size, maintain_order=True)
+        os.replace(f"{parquet_file}.tmp", parquet_file)
+
+        # Return the parquet file path
+        return parquet_file
+
+    def scan(grid_file:str = file._population_ascii,
+             bbox:tuple|None = None,
+             region:dict|None = None,
+             boundary_files:dict|None = None) -> pl.LazyFrame:
+        # Import necessary packages
+        import os
+        from .crosswalk import crosswalk
+
+        # Convert the csv once, and again only when the csv is newer than the parquet
+        parquet_file = grid_file
+        if grid_file.endswith(".csv"):
+            parquet_file = grid.parquet_path(grid_file)
+            if not os.path.exists(parquet_file) or os.path.getmtime(parquet_file) < os.path.getmtime(grid_file):
+                grid.convert(grid_file, parquet_file)
+
+        # Lazy scan so only the needed row groups are read, the row position is the cell id for the crosswalk
+        df = pl.scan_parquet(parquet_file, row_index_name="cell")
+
+        # Bounding box as (min lon, min lat, max lon, max lat), pushed down to the parquet reader
+        if bbox is not None:
+            df = df.filter(pl.col("X").is_between(bbox[0], bbox[2]),
+                           pl.col("Y").is_between(bbox[1], bbox[3]))
+
+        # Region as {level: [codes]}, e.g. {"district": ["14_1"]}, only keep the cells in the crosswalk for those regions
+        if region is not None:
+            df = df.join(crosswalk.scan(grid_file, region=region, boundary_files=boundary_files).select("cell"),
+                         how="semi", on="cell")
+
+        # Return the lazy frame
+        return df
@@ -0,0 +1,134 @@
+import numpy as np
+import polars as pl
+import pandas as pd
+
+class hexbin:
+    # Fixed number of hexagon across the width, each resolution is assigned once and reused by every filter
+    _nx_hexagon = (250, 500, 1000, 2000)
+    # Bounding box of Malaysia as (min lon, min lat, max lon, max lat), the grid is fixed so it does not move with the filter
+    _bounds = (99.5, 0.8, 119.5, 7.5)
+    # Offset to pack the axial coordinate of the hexagon into one integer id
+    _offset = 2**20
+    # Polygon of the hexagon already created for each resolution
+    _polygon_cache = {}
+
+    def mercator(lat:np.ndarray,
+                 lon:np.ndarray) -> tuple:
+        # Same web mercator projection as the map, so the hexagon is not stretched on the screen
+        lat, lon = np.radians(np.asarray(lat, dtype=np.float64)), np.radians(np.asarray(lon, dtype=np.float64))
+        return lon, np.log(np.tan(np.pi / 4 + lat / 2))
+
+    def inverse_mercator(x:np.ndarray,
+                         y:np.ndarray) -> tuple:
+        # Return as lat, lon in degree
+        return np.degrees(2 * np.arctan(np.exp(y)) - np.pi / 2), np.degrees(x)
+
+    def hex_size(nx_hexagon:int,
+                 bounds:tuple = _bounds) -> tuple:
+        # Origin of the grid and the radius of pointy top hexagon so that nx_hexagon fit across the width
+        x0, y0 = hexbin.mercator(bounds[1], bounds[0])
+        x1, _ = hexbin.mercator(bounds[3], bounds[2])
+        return float(x0), float(y0), float((x1 - x0) / nx_hexagon / np.sqrt(3))
+
+    def assign(lat:np.ndarray,
+               lon:np.ndarray,
+               nx_hexagon:int,
+               bounds:tuple = _bounds) -> np.ndarray:
+        # Convert to the fractional axial coordinate of the hexagon
+        x0, y0, size = hexbin.hex_size(nx_hexagon, bounds)
+        x, y = hexbin.mercator(lat, lon)
+        x, y = x - x0, y - y0
+        q = (np.sqrt(3) / 3 * x - y / 3) / size
+        r = (2 / 3 * y) / size
+
+        # Round to the nearest hexagon in cube coordinate, fix the component with the largest rounding error
+        s = -q - r
+        rq, rr, rs = np.round(q), np.round(r), np.round(s)
+        dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+        fix_q = (dq > dr) & (dq > ds)
+        fix_r = ~fix_q & (dr > ds)
+        rq = np.where(fix_q, -rr - rs, rq)
+        rr = np.where(fix_r, -rq - rs, rr)
+
+        # Return the hexagon id
+        return (rq.astype(np.int64) + hexbin._offset) * 2**21 + (rr.astype(np.int64) + hexbin._offset)
+
+    def index(df:pl.DataFrame|pd.DataFrame,
+              lat:str = "lat",
+              lon:str = "lon",
+              nx_list:tuple = _nx_hexagon,
+              bounds:tuple = _bounds) -> pl.DataFrame|pd.DataFrame:
+        # Add the hexagon id of every resolution as column hex_{nx}, only need to be done once for the dataset
+        hex_dict = {f"hex_{nx}":hexbin.assign(df[lat].to_numpy(), df[lon].to_numpy(), nx, bounds) for nx in nx_list}
+
+        # Return the same type as the input
+        if isinstance(df, pd.DataFrame):
+            return df.assign(**hex_dict)
+        return df.with_columns([pl.Series(name, value) for name, value in hex_dict.items()])
+
+    def aggregate(df:pl.DataFrame|pd.DataFrame,
+                  nx_hexagon:int,
+                  value:str = "estimated_str",
+                  by:str|list|None = None,
+                  min_count:int = 1) -> pl.DataFrame:
+        # Sum and count of the value in each hexagon using the column from index, no binning is done here
+        df = pl.from_pandas(df) if isinstance(df, pd.DataFrame) else df
+        by = [] if by is None else [by] if isinstance(by, str) else list(by)
+        result = df.group_by([f"hex_{nx_hexagon}"] + by)\
+                   .agg(pl.col(value).sum().alias(value), pl.len().alias("count"))\
+                   .rename({f"hex_{nx_hexagon}":"hex"})
+
+        # Only keep the hexagon with enough point, same as min_count of create_hexbin_mapbox
+        return result.filter(pl.col("count") >= min_count) if not by else result
+
+    def rollup(df:pl.DataFrame,
+               value:str = "estimated_str",
+               min_count:int = 1) -> pl.DataFrame:
+        # Combine the aggregate of each district into each hexagon, a hexagon can cross the district border
+        return df.group_by("hex")\
+                 .agg(pl.col(value).sum(), pl.col("count").sum())\
+                 .filter(pl.col("count") >= min_count)
+
+    def geojson(hex_list:np.ndarray,
+                nx_hexagon:int,
+                bounds:tuple = _bounds) -> dict:
+        # Only create the polygon that have not been created for this resolution
+        polygon_dict = hexbin._polygon_cache.setdefault((nx_hexagon, bounds), {})
+        hex_list = np.unique(np.asarray(hex_list, dtype=np.int64))
+        new = np.array([hex_id for hex_id in hex_list.tolist() if hex_id not in polygon_dict], dtype=np.int64)
+        if len(new) > 0:
+            # Center of each hexagon then the six corner, pointy top
+            x0, y0, size = hexbin.hex_size(nx_hexagon, bounds)
+            q, r = new // 2**21 - hexbin._offset, new % 2**21 - hexbin._offset
+            cx, cy = x0 + size * np.sqrt(3) * (q + r / 2), y0 + size * 1.5 * r
+            angle = np.radians(np.arange(30, 391, 60))
+            lat, lon = hexbin.inverse_mercator(cx[:, None] + size * np.cos(angle), cy[:, None] + size * np.sin(angle))
+            ring = np.round(np.stack([lon, lat], axis=-1), 5).tolist()
+            for hex_id, coordinates in zip(new.tolist(), ring):
+                polygon_dict[hex_id] = {"type":"Feature", "id":hex_id, "properties":{},
+                                        "geometry":{"type":"Polygon", "coordinates":[coordinates]}}
+
+        # Return the geojson of the hexagon only
+        return {"type":"FeatureCollection", "features":[polygon_dict[hex_id] for hex_id in hex_list.tolist()]}
+
+    def figure(df:pl.DataFrame,
+               nx_hexagon:int,
+               value:str = "estimated_str",
+               color_continuous_scale:str|None = None,
+               mapbox_style:str = "basic",
+               opacity:float = 0.5,
+               bounds:tuple = _bounds,
+               **kwargs):
+        # Import necessary packages
+        import plotly.express as px
+
+        # Draw the aggregated hexagon as choropleth, only the polygon of the shown hexagon is sent
+        return px.choropleth_mapbox(df.select("hex", value, "count").to_pandas(),
+                                    geojson=hexbin.geojson(df["hex"].to_numpy(), nx_hexagon, bounds),
+                                    locations="hex",
+                                    color=value,
+                                    color_continuous_scale=color_continuous_scale,
+                                    mapbox_style=mapbox_style,
+                                    opacity=opacity,
+                                    hover_data={"hex":False, "count":True},
+                                    **kwargs).update_traces(marker_line_width=0)
@@ -1,5 +1,7 @@
 import pandas as pd
-import geopandas as gpd
+import polars as pl
+from .boundary import boundary
+from .distance import distance
 
 class map:
     # Options
@@ -33,50 +35,36 @@ class map:
                       "Sp Tengah":"Seberang Perai Tengah",
                       "Sp Utara":"Seberang Perai Utara"}
     
-    def convert_pandas_geopandas(df:pd.DataFrame,
+    def convert_pandas_geopandas(df:pd.DataFrame|pl.DataFrame,
                                  lon:str,
                                  lat:str,
-                                 crs:str = 'EPSG:4326') -> gpd.GeoDataFrame:
-        # Import necessary packages
-        from shapely.geometry import Point
+                                 crs:str = 'EPSG:4326',
+                                 geometry:bool = True) -> "gpd.GeoDataFrame|pd.DataFrame":
+        # Accept polars dataframe as well
+        if isinstance(df, pl.DataFrame):
+            df = df.to_pandas()
+
+        # Skip the geometry if only the coordinates are needed
+        if not geometry:
+            return df
 
-        # Changet the point for lat lon
-        df["geometry"] = df.apply(lambda row: Point(row[lon], row[lat]), axis=1)
+        # Import necessary packages
+        import geopandas as gpd
 
-        # Return the dataframe
-        return gpd.GeoDataFrame(df, geometry='geometry', crs=crs)
+        # Build the point geometry from the lon lat columns in one call
+        return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df[lon], df[lat]), crs=crs)
     
-    def get_polygon_area(df:gpd.GeoDataFrame,
+    def get_polygon_area(df:"gpd.GeoDataFrame",
                          geometry_column:str = "geometry",
                          area_column:str = "area",
-                         final_crs:str = "EPSG:4326") -> gpd.GeoDataFrame:
+                         final_crs:str = "EPSG:4326") -> "gpd.GeoDataFrame":
         df = df.to_crs({'proj':'cea'})
         df.loc[:,area_column] = df.loc[:,geometry_column].area/ 10**6
         return df.to_crs(final_crs)
     
     def haversine(lat1, lon1, lat2, lon2):
-        # Import necessary packages
-        import numpy as np
-
-        R = 6371.0 # Earth radius in kilometers
-
-        # Radians both lat and lon
-        lat1_rad, lon1_rad = np.radians(lat1), np.radians(lon1)
-        lat2_rad, lon2_rad = np.radians(lat2), np.radians(lon2)
-
-        # Calculate the difference between lat and lon
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-
-        # Perform the Harversine as per wikipedia
-        a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
-        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-
-        # Times with the earth raidus
-        distance = R * c
-        
-        # Return the values
-        return distance
+        # Use the shared vectorized haversine from distance
+        return distance.haversine(lat1, lon1, lat2, lon2)
 
     def read_geojson_file(file:str):
         # Import packages
@@ -103,13 +91,14 @@ class map:
                         marker_line_width:float = 0.5,
                         marker_opacity:float = 0.5,
                         showlegend:bool = True,
-                        text:tuple|None = None):
+                        text:tuple|None = None,
+                        simplify:bool = True):
         # Import necessary packages
         import plotly.graph_objects as go
         import os
 
-        # use json to load the choropleth file
-        geojson_data = map.read_geojson_file(map_file)
+        # Load the choropleth file simplified for the zoom level, or the full resolution file
+        geojson_data = boundary.read_geojson(map_file, zoom=mapbox_zoom if simplify else None)
 
         if text!=None:
             text=df.loc[:,text]
@@ -148,7 +137,7 @@ class map:
         else:
             return []
         
-    def draw_polygon_line(df: gpd.GeoDataFrame,
+    def draw_polygon_line(df: "gpd.GeoDataFrame",
                       polygon_name:str,
                       geometry_column:str = "geometry",
                       ) -> pd.DataFrame:
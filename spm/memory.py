@@ -0,0 +1,121 @@
+import threading
+
+class memory:
+    # Interval of the RSS sampling while any stage is running, the peak between two samples can be missed
+    _interval = 0.01
+    # Rough native size of one GEOS geometry besides its coordinates, the python object size is measured
+    _geos_overhead = 112
+    # Running stages whose peak RSS is updated by the sampler thread
+    _active = {}
+    _lock = threading.Lock()
+    _sampler = None
+
+    def rss() -> int:
+        # Import necessary packages
+        import os
+        import sys
+
+        # Current resident set size in bytes, from /proc on linux
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            pass
+
+        # Use psutil when available, otherwise the peak of the process is the best left
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss
+        except ImportError:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == "darwin" else peak * 1024
+
+    def geometry_size(values) -> dict:
+        # Import necessary packages
+        import sys
+        import numpy as np
+        import shapely
+
+        # Pointer array, one python object for each geometry, and the GEOS geometry with its coordinates
+        values = np.asarray(values, dtype=object)
+        valid = values[shapely.is_geometry(values)]
+        coordinates = int(shapely.get_num_coordinates(valid).sum()) if len(valid) > 0 else 0
+        dimension = 3 if len(valid) > 0 and shapely.has_z(valid[:1]).any() else 2
+        python_object = len(valid) * sys.getsizeof(valid[0]) if len(valid) > 0 else 0
+
+        # Return the size in bytes
+        return {"buffer":values.nbytes, "object":python_object, "native":len(valid) * memory._geos_overhead + coordinates * dimension * 8}
+
+    def frame_size(obj) -> dict:
+        # Import necessary packages
+        import sys
+        import numpy as np
+
+        # Sum of each item of the tuple returned by a function
+        size = {"buffer":0, "object":0, "native":0}
+        if isinstance(obj, (tuple, list)):
+            for item in obj:
+                item_size = memory.frame_size(item)
+                for key in size:
+                    size[key] += item_size[key]
+
+        # Arrow buffer of polars and pyarrow
+        elif hasattr(obj, "estimated_size"):
+            size["buffer"] = int(obj.estimated_size())
+        elif hasattr(obj, "nbytes") and hasattr(obj, "schema"):
+            size["buffer"] = int(obj.nbytes)
+
+        # Numpy buffer of pandas, the string and other python object on top, and the geometry column separately
+        elif hasattr(obj, "memory_usage"):
+            frame = obj.to_frame() if obj.ndim == 1 else obj
+            size["buffer"] = int(frame.index.memory_usage())
+            for num in range(frame.shape[1]):
+                column = frame.iloc[:, num]
+                if str(column.dtype) == "geometry":
+                    for key, value in memory.geometry_size(column.array).items():
+                        size[key] += value
+                    continue
+                shallow = int(column.memory_usage(index=False, deep=False))
+                size["buffer"] += shallow
+                size["object"] += int(column.memory_usage(index=False, deep=True)) - shallow
+
+        # Numpy array
+        elif isinstance(obj, np.ndarray):
+            size["buffer"] = int(obj.nbytes)
+        else:
+            size["object"] = sys.getsizeof(obj)
+
+        # Return the size in bytes with the total
+        return {**size, "total":size["buffer"] + size["object"] + size["native"]}
+
+    def sample() -> None:
+        # Import necessary packages
+        import time
+
+        # Keep the highest RSS seen by each running stage, stop when no stage is running
+        while True:
+            with memory._lock:
+                if not memory._active:
+                    memory._sampler = None
+                    return
+                rss = memory.rss()
+                for frame in memory._active.values():
+                    frame["peak_rss"] = max(frame["peak_rss"], rss)
+            time.sleep(memory._interval)
+
+    def track(frame:dict) -> None:
+        # Start the stage with the current RSS, the sampler thread is started with the first running stage
+        frame["rss_start"] = frame["peak_rss"] = memory.rss()
+        with memory._lock:
+            memory._active[id(frame)] = frame
+            if memory._sampler is None:
+                memory._sampler = threading.Thread(target=memory.sample, name="spm-memory-sampler", daemon=True)
+                memory._sampler.start()
+
+    def untrack(frame:dict) -> None:
+        # End the stage, the RSS at the end also count toward the peak
+        with memory._lock:
+            memory._active.pop(id(frame), None)
+        frame["rss_end"] = memory.rss()
+        frame["peak_rss"] = max(frame["peak_rss"], frame["rss_end"])
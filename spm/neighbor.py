@@ -0,0 +1,113 @@
+from .distance import distance
+import numpy as np
+import pandas as pd
+
+class neighbor:
+    # Default radius in km for counting reachable GPs
+    _radius_km = [1, 3, 5, 10]
+    # Number of grid points to query per block for the neighbor list
+    _chunk_size = 100_000
+
+    def km_to_chord(radius_km:float) -> float:
+        # Convert the great circle distance in km into straight line distance on the unit sphere
+        return 2 * np.sin(np.asarray(radius_km, dtype=np.float64) / (2 * distance._earth_radius_km))
+
+    def count_within(df1:pd.DataFrame,
+                     df1_lat:str,
+                     df1_lon:str,
+                     df2:pd.DataFrame,
+                     df2_lat:str,
+                     df2_lon:str,
+                     radius_km:list|tuple = _radius_km,
+                     tree = None,
+                     workers:int = -1) -> dict:
+        # Build the KD-tree for the second dataframe if not provided
+        if tree is None:
+            tree = distance.build_tree(df2[df2_lat], df2[df2_lon])
+
+        # Project the first dataframe onto unit sphere
+        points = distance.to_unit_sphere(df1[df1_lat], df1[df1_lon])
+
+        # Only count the neighbors for each radius without building the list
+        return {radius: tree.query_ball_point(points, r=float(neighbor.km_to_chord(radius)),
+                                              return_length=True, workers=workers).astype(np.int32)
+                for radius in radius_km}
+
+    def within_radius(df1:pd.DataFrame,
+                      df1_lat:str,
+                      df1_lon:str,
+                      df2:pd.DataFrame,
+                      df2_lat:str,
+                      df2_lon:str,
+                      radius_km:float,
+                      tree = None,
+                      chunk_size:int = _chunk_size) -> tuple:
+        # Import necessary packages
+        from scipy.spatial import cKDTree
+
+        # Prepare the lat lon as numpy array
+        lat1, lon1 = np.asarray(df1[df1_lat], dtype=np.float64), np.asarray(df1[df1_lon], dtype=np.float64)
+        lat2, lon2 = np.asarray(df2[df2_lat], dtype=np.float64), np.asarray(df2[df2_lon], dtype=np.float64)
+
+        # Build the KD-tree for the second dataframe if not provided
+        if tree is None:
+            tree = distance.build_tree(lat2, lon2)
+        chord = float(neighbor.km_to_chord(radius_km))
+
+        # Query block by block so only the pairs within radius are kept
+        rows, columns = [], []
+        for start in range(0, len(lat1), chunk_size):
+            stop = min(start + chunk_size, len(lat1))
+            pairs = cKDTree(distance.to_unit_sphere(lat1[start:stop], lon1[start:stop]))\
+                        .sparse_distance_matrix(tree, max_distance=chord, output_type="ndarray")
+            rows.append(pairs["i"].astype(np.int64) + start)
+            columns.append(pairs["j"].astype(np.int64))
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        columns = np.concatenate(columns) if columns else np.empty(0, dtype=np.int64)
+
+        # Calculate the distance in km for the pairs found
+        distance_km = distance.haversine(lat1[rows], lon1[rows], lat2[columns], lon2[columns])
+
+        # Sort by row then distance, so each row of neighbor list start from the nearest
+        order = np.lexsort((distance_km, rows))
+        rows, columns, distance_km = rows[order], columns[order], distance_km[order]
+
+        # Compress the rows into CSR style index pointer
+        indptr = np.zeros(len(lat1) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(lat1)), out=indptr[1:])
+
+        # Return indptr, the position in second dataframe and the distance in km
+        return indptr, columns, distance_km
+
+    def k_nearest(df1:pd.DataFrame,
+                  df1_lat:str,
+                  df1_lon:str,
+                  df2:pd.DataFrame,
+                  df2_lat:str,
+                  df2_lon:str,
+                  k:int = 5,
+                  column_to_match:str|None = None,
+                  tree = None,
+                  workers:int = -1) -> tuple:
+        # Prepare the lat lon as numpy array
+        lat1, lon1 = np.asarray(df1[df1_lat], dtype=np.float64), np.asarray(df1[df1_lon], dtype=np.float64)
+        lat2, lon2 = np.asarray(df2[df2_lat], dtype=np.float64), np.asarray(df2[df2_lon], dtype=np.float64)
+
+        # Build the KD-tree for the second dataframe if not provided
+        if tree is None:
+            tree = distance.build_tree(lat2, lon2)
+
+        # Cannot ask for more neighbor than the second dataframe have
+        k = min(k, len(lat2))
+
+        # Query the k nearest, always keep 2 dimension even when k is 1
+        _, index = tree.query(distance.to_unit_sphere(lat1, lon1), k=k, workers=workers)
+        index = index.reshape(len(lat1), k)
+
+        # Calculate the distance in km for each neighbor
+        distance_km = distance.haversine(lat1[:, None], lon1[:, None], lat2[index], lon2[index])
+
+        # Return the position in second dataframe if no column to match, else return the matched id
+        if column_to_match is None:
+            return index, distance_km
+        return np.asarray(df2[column_to_match])[index], distance_km
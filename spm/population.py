@@ -1,10 +1,15 @@
 from .file import file
-from .map import map
-from .provider import provider
+from .crosswalk import crosswalk
+from .distance import distance
+from .timing import timing
 import polars as pl
 import pandas as pd
 
 class population:
+    # Column of ann_grouped after the group key, in the same order as ann
+    _ann_columns = ("count", "n", "area", "min", "median", "iqr", "max", "spearman_r", "spearman_p_value",
+                    "observed_mean_distance", "expected_mean_distance", "ANN", "ann_z_score", "p_value")
+
     def prepare_ascii_file(gp_df:pd.DataFrame,
                            district_geojson:str,
                            parlimen_geojson:str,
@@ -12,33 +17,50 @@ class population:
         # Import necessary packages
         import geopandas as gpd
 
-        # Read the geojson file of parlimen and district
-        parlimen = gpd.read_file(parlimen_geojson)
+        # Read the properties of parlimen
+        parlimen = crosswalk.regions(parlimen_geojson, "parlimen").drop("state", "code_state")
 
         # To calculate the area for each district in km2
-        district = gpd.read_file(district_geojson)
-        district = district.to_crs({'proj':'cea'})
-        district["area"] = district['geometry'].area/ 10**6
-        district = district.to_crs('EPSG:4326')
-
-        # Prepare the ascii xyz file downloaded from Worldpop.org, conver the xyz into geopandas dataframe
-        population_ascii = map.convert_pandas_geopandas(pd.read_csv(population_ascii_file),lat="Y",lon="X")
-
-        # Spatial join population with parlimen and district and drop unnecessary columns
-        temp_population = population_ascii.sjoin(parlimen, how="inner")\
-                                  .drop(columns=["state", "index_right", "code_state"])\
-                                  .sjoin(district, how="inner")\
-                                  .drop(columns=["index_right", "geometry"])
+        with timing.stage("population.prepare_ascii_file:district_area") as stage:
+            district = gpd.read_file(district_geojson)
+            district = district.to_crs({'proj':'cea'})
+            district["area"] = district['geometry'].area/ 10**6
+            district = pl.from_pandas(pd.DataFrame(district.drop(columns="geometry")))\
+                         .with_row_index("district_id")\
+                         .with_columns(pl.col("district_id").cast(pl.Int32))
+            stage["output"] = district
+
+        # Get the parlimen and district of each point from the cached crosswalk instead of spatial join every time
+        with timing.stage("population.prepare_ascii_file:crosswalk") as stage:
+            region = crosswalk.load(grid_file=population_ascii_file,
+                                    boundary_files={"parlimen":parlimen_geojson, "district":district_geojson})
+            stage["output"] = region
+
+        # Join population with parlimen and district by their id and drop unnecessary columns
+        with timing.stage("population.prepare_ascii_file:join") as stage:
+            temp_population = crosswalk.read_grid(population_ascii_file)\
+                                       .join(region.select("cell", "parlimen_id", "district_id").drop_nulls(), how="inner", on="cell")\
+                                       .join(parlimen, how="inner", on="parlimen_id")\
+                                       .join(district, how="inner", on="district_id")\
+                                       .drop("cell", "parlimen_id", "district_id")
+            stage["output"] = temp_population
+        with timing.stage("population.prepare_ascii_file:to_pandas", rows_in=temp_population.height) as stage:
+            temp_population = temp_population.to_pandas()
+            stage["output"] = temp_population
         
         # To ensure each point of lat lon within each parlimen have its own population
-        temp_population = temp_population.merge(temp_population.pivot_table(index="code_parlimen", values="Z", aggfunc=sum)\
-                                                               .reset_index().rename(columns={"Z":"parlimen_z"}),
-                              how="left", on="code_parlimen")
+        with timing.stage("population.prepare_ascii_file:parlimen_z", rows_in=len(temp_population)) as stage:
+            temp_population = temp_population.merge(temp_population.pivot_table(index="code_parlimen", values="Z", aggfunc=sum)\
+                                                                   .reset_index().rename(columns={"Z":"parlimen_z"}),
+                                  how="left", on="code_parlimen")
+            stage["output"] = temp_population
         
         # To match the nearest GP for the population and calculate the distance between each point to their nearest gp
-        population_gp = gp.match_nearest(df1=temp_population, df1_lat="Y", df1_lon="X",
-                                         df2=gp_df, df2_lat="Latitude", df2_lon="Longitude",
-                                         column_to_match="id")
+        with timing.stage("population.prepare_ascii_file:match_nearest", rows_in=len(temp_population)) as stage:
+            population_gp = distance.match_nearest(df1=temp_population, df1_lat="Y", df1_lon="X",
+                                                   df2=gp_df, df2_lat="Latitude", df2_lon="Longitude",
+                                                   column_to_match="id")
+            stage["output"] = population_gp
         
         # Return the dataframe first
         return temp_population
@@ -117,7 +139,63 @@ class population:
             "ANN":[ann],
             "ann_z_score":[z_score],
             "p_value":[p_value]
-            }) 
+            })
+
+    def ann_grouped(df:pl.DataFrame|pd.DataFrame,
+                    n_column:str,
+                    a_column:str,
+                    distance_column:str,
+                    group_by:str|list = "district",
+                    district_column:str = "district",
+                    total:bool = True) -> pl.DataFrame:
+        # Import the necessary packages
+        import numpy as np
+        from scipy.stats import norm, t
+
+        # Accept pandas dataframe as well
+        df = pl.from_pandas(df) if isinstance(df, pd.DataFrame) else df
+        group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+
+        # The group key is kept as column of the result, so it cannot be a column summed or a statistic of the same name
+        overlap = [key for key in group_by if key in population._ann_columns or key in (n_column, a_column, distance_column)]
+        if overlap:
+            raise ValueError(f"Cannot group by {', '.join(overlap)}, it is also the population, area, distance or a statistic column")
+
+        # Every statistic of ann as expression, so each group is computed in the same pass
+        n = pl.col(n_column).sum()
+        area = pl.col(a_column).filter(pl.col(district_column).is_first_distinct()).sum()
+        do = pl.col(distance_column).sum() / n
+        de = 0.5 / (n / area).sqrt()
+        se = 0.26136 / (n * n / area).sqrt()
+        expression_list = [pl.len().alias("count"),
+                           n.alias("n"),
+                           area.alias("area"),
+                           pl.col(distance_column).min().alias("min"),
+                           pl.col(distance_column).median().alias("median"),
+                           (pl.col(distance_column).quantile(0.75) - pl.col(distance_column).quantile(0.25)).alias("iqr"),
+                           pl.col(distance_column).max().alias("max"),
+                           pl.corr(n_column, distance_column, method="spearman").alias("spearman_r"),
+                           do.alias("observed_mean_distance"),
+                           de.alias("expected_mean_distance"),
+                           (do / de).alias("ANN"),
+                           ((do - de) / se).alias("ann_z_score")]
+
+        # Group by the keys, and add the total of all groups in the same query
+        query_list = [df.lazy().group_by(group_by).agg(expression_list).sort(group_by)]
+        if total:
+            query_list.append(df.lazy().select([pl.lit(f"{df[key].n_unique()} {key.capitalize()}s").alias(key) for key in group_by] + expression_list))
+            query_list[0] = query_list[0].with_columns(pl.col(group_by).cast(pl.String))
+        result = pl.concat(query_list[::-1], how="vertical_relaxed").collect()
+
+        # p value of the spearman r from t distribution same as scipy spearmanr, and p value of the ann z score
+        r, count = result["spearman_r"].to_numpy(), result["count"].to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_value = r * np.sqrt((count - 2) / ((1 - r) * (1 + r)))
+        result = result.with_columns(pl.Series("spearman_p_value", 2 * t.sf(np.abs(t_value), count - 2)),
+                                     pl.Series("p_value", norm.sf(np.abs(result["ann_z_score"].to_numpy()))))
+
+        # Return in the same column order as ann
+        return result.select(*group_by, *population._ann_columns)
 
 
 
@@ -171,38 +249,40 @@ class population:
     #     return parlimen_population.join(percentage_df, how="left", on="parlimen")\
     #                               .join(code_parlimen_district, how="left", on="code_parlimen")
     
-    def str_population_ascii(method:str) -> pl.DataFrame:
+    def str_population_ascii(method:str,
+                             str_file:str = file._file_spm_parquet,
+                             grid_file:str = file._population_ascii,
+                             parlimen_population_file:str = file._population_parlimen,
+                             parlimen_file:str = file._map_parlimen,
+                             district_file:str = file._map_district) -> pl.DataFrame:
         # Generated the file._population_str_ascii_parlimen
-        # Import packages
-        import geopandas as gpd
-        import pandas as pd
-
-        # To merge the parlimen population from DOSM to geojson file to get teh code_parlimen
-        parlimen_population = pl.read_parquet(file._population_parlimen)
-        parlimen_population_geo = gpd.GeoDataFrame(data=parlimen_population.to_pandas()\
-                                                        .merge(gpd.read_file(file._map_parlimen).drop(columns="state"), 
-                                                                how="left", on="parlimen"),
-                                                  geometry="geometry", crs='EPSG:4326')
+        # To merge the parlimen population from DOSM to properties of geojson file to get teh code_parlimen
+        parlimen_population = pl.read_parquet(parlimen_population_file)\
+                                .join(crosswalk.regions(parlimen_file, "parlimen").drop("state"), how="left", on="parlimen")
+
         # Calculate the STR population according to parlimen
-        if method == "individual":
-          str_parlimen = population.convert_str_to_long(df = pl.read_parquet(file._file_spm_parquet))\
-                              .group_by("code_parlimen").len("str_count")
-        elif method == "households":
-            str_parlimen = pl.read_parquet(file._file_spm_parquet)\
-                              .unique(subset="id_ben")\
-                              .group_by("code_parlimen").len("str_count")
+        with timing.stage(f"population.str_population_ascii:str_count_{method}") as stage:
+            if method == "individual":
+              str_parlimen = population.convert_str_to_long(df = pl.read_parquet(str_file))\
+                                  .group_by("code_parlimen").len("str_count")
+            elif method == "households":
+                str_parlimen = pl.read_parquet(str_file)\
+                                  .unique(subset="id_ben")\
+                                  .group_by("code_parlimen").len("str_count")
+            stage["output"] = str_parlimen
 
         # Prepare on ASCII file
-        population_ascii = map.convert_pandas_geopandas(pd.read_csv(file._population_ascii), lat="Y", lon="X")
+        with timing.stage("population.str_population_ascii:read_grid") as stage:
+            population_ascii = crosswalk.read_grid(grid_file)
+            stage["output"] = population_ascii
         # Calculate the population per x, y by times the ratio between dosm population and ascii population then * growth rate to get population at year 2023
-        population_ascii.loc[:,"ascii_population"] = population_ascii.loc[:,"Z"] * 32447100 /population_ascii.Z.sum() * 1.0287
+        population_ascii = population_ascii.with_columns((pl.col("Z") * 32447100 / pl.col("Z").sum() * 1.0287).alias("ascii_population"))
 
         # Filter the parliment population date and then get the population per code parlimen
-        temp_df = pl.from_pandas(parlimen_population_geo.drop(columns="geometry"))\
-                    .filter(pl.col("date").cast(pl.Date).cast(pl.String) == "2020-01-01",
-                                                pl.col("sex") == "both",
-                                                pl.col("age") == "overall",
-                                                pl.col("ethnicity") == "overall")\
+        temp_df = parlimen_population.filter(pl.col("date").cast(pl.Date).cast(pl.String) == "2020-01-01",
+                                             pl.col("sex") == "both",
+                                             pl.col("age") == "overall",
+                                             pl.col("ethnicity") == "overall")\
                                     .with_columns(pl.col("population") * 1000)\
                     .group_by("code_parlimen").agg(pl.col("population").sum())
         
@@ -210,18 +290,25 @@ class population:
         percentage_df = temp_df.join(str_parlimen, on="code_parlimen")\
                                 .with_columns((pl.col("str_count")/pl.col("population")).alias("str_percentage"))
 
+        # Get the parlimen and district of each point from the cached crosswalk, only integer join needed
+        with timing.stage("population.str_population_ascii:crosswalk") as stage:
+            region = crosswalk.load(grid_file=grid_file, boundary_files={"parlimen":parlimen_file, "district":district_file})\
+                              .select("cell", "parlimen_id", "district_id").drop_nulls()
+            district = crosswalk.regions(district_file, "district").drop("state")
+            stage["output"] = region
+
         # Merge both ascii and parlimen_population, then join with the percetage above, then times with the projected 2023 population and str ratio to get estimated population of str per lat lon
-        temp_df = pl.from_pandas(gpd.sjoin(parlimen_population_geo, population_ascii)\
-                    .loc[:,("date", "state", "sex", "age", "ethnicity", "population", "code_parlimen", "X", "Y", "ascii_population")])\
-                    .with_columns(pl.col("date").cast(pl.Date))\
-                    .join(percentage_df.select("code_parlimen", "str_percentage"), how="left", on ="code_parlimen")\
-                    .with_columns((pl.col("ascii_population") * pl.col("str_percentage")).alias("str_ascii"))
-        
-        # Due to forget to add district, need to convert the temp_df to geopandas again
-        temp_df = map.convert_pandas_geopandas(temp_df.to_pandas(), lat="Y", lon="X")
+        with timing.stage("population.str_population_ascii:join", rows_in=population_ascii.height) as stage:
+            temp_df = population_ascii.join(region, how="inner", on="cell")\
+                        .join(parlimen_population, how="inner", on="parlimen_id")\
+                        .select("date", "state", "sex", "age", "ethnicity", "population", "code_parlimen", "X", "Y", "Z", "ascii_population", "district_id")\
+                        .with_columns(pl.col("date").cast(pl.Date))\
+                        .join(percentage_df.select("code_parlimen", "str_percentage"), how="left", on ="code_parlimen")\
+                        .with_columns((pl.col("ascii_population") * pl.col("str_percentage")).alias("str_ascii"))
 
-        # Spatial join with district map file and then return the df
-        final_df = temp_df.sjoin(gpd.read_file(file._map_district).drop(columns="state")).drop(columns = ["geometry", "index_right"])\
+            # Add the district by its id and then return the df
+            final_df = temp_df.join(district, how="inner", on="district_id").drop("district_id")
+            stage["output"] = final_df
         
         # Return the dataframe
-        return pl.from_pandas(final_df).with_columns(pl.col("date").cast(pl.Date))
\ No newline at end of file
+        return final_df.with_columns(pl.col("date").cast(pl.Date))
@@ -1,6 +1,8 @@
 from .file import file
+from .distance import distance
+from .geocode import geocode
+from .scraper import scraper
 import pandas as pd
-import geopandas as gpd
 
 class provider:
     _district_code_list = ['14_1', '13_1', '12_7', '10_8', '10_1', '10_5', '10_2', '8_3', '7_4', '1_2']
@@ -46,6 +48,9 @@ class provider:
 
     def get_parlimen_list_from_district(parlimen_file:str = file._map_parlimen,
                                         district_file:str = file._map_district):
+        # Import necessary packages
+        import geopandas as gpd
+
         # Read the necessary file
         parlimen = gpd.read_file(parlimen_file)
         district = gpd.read_file(district_file)
@@ -57,31 +62,14 @@ class provider:
     
     def read_spm_gp_list(state_dict: dict = _dict_gp_spm,
                          selangot_dict:dict = _selangor_district_dict,
-                         dict_gp_change_state:dict = _dict_gp_change_state) -> pd.DataFrame:
-        # Import the necessary packages
-        import pandas as pd
-
-        # Create empty dataframe
-        df = pd.DataFrame()
-
-        # To loop through the **kwargs
-        for key, value in state_dict.items():
-            # loop through the value in range loop
-            for num in range(1, value[0]):
-                # Read the html
-                temp_df = pd.read_html(f"https://kelayakan-spm.protecthealth.com.my/find-clinics?state_code={key}&page={num}")[0]
-                temp_df.loc[:,"state"] = key
-                temp_df.loc[:,"code_state_district"] = value[1]
-                df = pd.concat([df, temp_df], ignore_index=True)
-
-        for key, value in selangot_dict.items():
-            # loop through the value in range loop
-            for num in range(1, value[1]):
-                # Read the html
-                temp_df = pd.read_html(f"https://kelayakan-spm.protecthealth.com.my/find-clinics?state_code=selangor&district_code={value[0]}&page={num}")[0]
-                temp_df.loc[:,"state"] = "selangor"
-                temp_df.loc[:,"code_state_district"] = value[2]
-                df = pd.concat([df, temp_df], ignore_index=True)
+                         dict_gp_change_state:dict = _dict_gp_change_state,
+                         base_url:str = scraper._base_url,
+                         max_workers:int = scraper._max_workers,
+                         refresh:bool = False) -> pd.DataFrame:
+        # Fetch every result page concurrently with one session, then combine them in one concat
+        df = scraper.read_pages(scraper.page_list(state_dict, selangot_dict, base_url=base_url),
+                                max_workers=max_workers,
+                                refresh=refresh)
         
         # Change the Tutup to Buka 
         df.loc[:,"Nama Klinik"] = df.loc[:,"Nama Klinik"].str.replace("Tutup", "Buka")
@@ -92,69 +80,47 @@ class provider:
         for item in ["Bimbit", "Lokasi", "Tel", "Laman Web"]:
             df.loc[:,"Nama Klinik"] = df.loc[:,"Nama Klinik"].str.replace(item, "")
 
-        # To loop through the df.
-        for index, row in df.iterrows():
-            # Split the information
-            text_split = row["Nama Klinik"].split("|")
-            # To put clinic name
-            df.at[index, "clinic_name"] = text_split[0]
-            # TO put the clinic address information
-            df.at[index, "address"] = text_split[1]
+        # Split the clinic name and address information
+        text_split = df.loc[:,"Nama Klinik"].str.split("|")
+        df.loc[:,"clinic_name"] = text_split.str[0]
+        df.loc[:,"address"] = text_split.str[1]
 
         # To change name
         for key, value in dict_gp_change_state.items():
             df.loc[:,"state"] = df.loc[:,"state"].str.replace(key, value)
 
         # Return the dataframe
-        return df.loc[:,("clinic_name", "address", "state")]
+        return df.loc[:,("clinic_name", "address", "state", "code_state_district")]
     
     def get_lat_lon(df:pd.DataFrame,
-                    address_col:str = "address") -> pd.DataFrame:
-        from geopy.geocoders import Nominatim
-        from geopy.exc import GeocoderTimedOut, GeocoderRateLimited, GeocoderNotFound
-        from geopy.extra.rate_limiter import RateLimiter
-
-        # Setting the nominatim user agent
-        geolocator = Nominatim(user_agent="str_address_geocoding")
-
-        # Set the rate limiters
-        geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1, max_retries = 0)
-
-        try:
-            # To get the geolocation of the address
-            df.loc[:,"location"] = df.loc[:,address_col].apply(geocode)
-            df.loc[:,'Latitude'] = df.loc[:,'location'].apply(lambda loc: tuple(loc.point)[0] if loc else None)
-            df.loc[:,'Longitude'] = df.loc[:,'location'].apply(lambda loc: tuple(loc.point)[1] if loc else None)
-        except GeocoderTimedOut or GeocoderRateLimited or GeocoderNotFound:
-            print("Error")
-
-        # Return the dataframe
+                    address_col:str = "address",
+                    backend = None,
+                    cache_file:str = file._cache_geocode,
+                    retry_missing:bool = False,
+                    errors:str = "warn") -> pd.DataFrame:
+        # Geocode only the address that is not in the cache, default to Nominatim
+        location = geocode.lookup(df.loc[:,address_col], backend=backend, cache_file=cache_file, retry_missing=retry_missing)\
+                          .rename(columns={"address":"normalized_address", "latitude":"Latitude", "longitude":"Longitude"})
+
+        # The address that failed is left without location, or stop here with errors="raise" so nothing is written without it
+        failed = location.loc[location.loc[:,"error"].notna()]
+        if errors == "raise" and len(failed) > 0:
+            raise RuntimeError(f"{len(failed)} addresses failed to geocode: "
+                               + "; ".join(f"{address} ({error})" for address, error in zip(failed["normalized_address"], failed["error"])))
+
+        # Put the location back to each row by its normalized address
+        df = df.drop(columns=["Latitude", "Longitude"], errors="ignore")\
+               .assign(normalized_address=df.loc[:,address_col].map(geocode.normalize))\
+               .merge(location.loc[:,("normalized_address", "Latitude", "Longitude")], how="left", on="normalized_address")\
+               .drop(columns="normalized_address")
+        df.attrs["geocode"] = location.attrs.get("counts", {})
+
+        # Return the dataframe, with the count of cached, geocoded and failed address in attrs
         return df
     
     def haversine(lat1:float, lon1:float, lat2:float, lon2:float) -> float:
-        # Import impoartant packages
-        import numpy as np
-
-        # Earth radius in kilometers
-        R = 6371.0 
-
-        # Find the radians for both lat and lon
-        lat1_rad, lon1_rad = np.radians(lat1), np.radians(lon1)
-        lat2_rad, lon2_rad = np.radians(lat2), np.radians(lon2)
-
-        # Find the difference of lat and lon between both
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-
-        # Use the haversine formula
-        a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
-        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-
-        # Times the earth radius to become km in difference
-        distance = R * c
-
-        # Return the value
-        return distance
+        # Use the shared vectorized haversine from distance
+        return distance.haversine(lat1, lon1, lat2, lon2)
     
     def match_nearest(df1:pd.DataFrame, 
                       df1_lat:str, 
@@ -164,21 +130,8 @@ class provider:
                       df2_lon:str, 
                       column_to_match:str,
                       distance_column:str="distance_km") -> pd.DataFrame:
-        # Define the loop for the second dataframe first
-        def find_nearest(lat, lon):
-            # Imagine to have a lat lon that will apply throughout the second dataframe's lat lon
-            distance = df2.apply(lambda row: gp.haversine(lat, lon, row[df2_lat], row[df2_lon]), axis=1)
-            # Return the column to match based on shortest distance
-            return df2.loc[distance.idxmin(), column_to_match]
-        
-        # By looping the first dataframe and then apply the function to loop the second dataframe
-        df1.loc[:,column_to_match] = df1.apply(lambda row: find_nearest(row[df1_lat], row[df1_lon]), axis=1)
-
-        # Merge the first and second dataframe together
-        df = df1.merge(df2, how="left", on=column_to_match)
-
-        # Calculate the difference between the both match
-        df.loc[:,distance_column] = df.apply(lambda row: gp.haversine(lat1 = row[df1_lat], lon1 = row[df1_lon], lat2 = row[df2_lat], lon2 = row[df2_lon]), axis = 1)
-
-        # Return the dataframe
-        return df
\ No newline at end of file
+        # Use the KD-tree nearest search from distance
+        return distance.match_nearest(df1=df1, df1_lat=df1_lat, df1_lon=df1_lon,
+                                      df2=df2, df2_lat=df2_lat, df2_lon=df2_lon,
+                                      column_to_match=column_to_match,
+                                      distance_column=distance_column)
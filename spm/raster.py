@@ -0,0 +1,129 @@
+from .file import file
+import numpy as np
+
+class raster:
+    # WorldPop 1km grid is 30 arc-second
+    _resolution = 1 / 120
+    # Label for cell outside every polygon and cell that touch a boundary
+    _outside = -1
+    _boundary = -2
+
+    def lattice(x:np.ndarray,
+                y:np.ndarray,
+                resolution:float = _resolution) -> tuple:
+        # The grid point is the cell center, so the lattice start from the smallest center
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        x0, y0 = float(x.min()), float(y.min())
+
+        # Return the origin and number of columns and rows
+        return x0, y0, int(round((x.max() - x0) / resolution)) + 1, int(round((y.max() - y0) / resolution)) + 1
+
+    def cell_index(x:np.ndarray,
+                   y:np.ndarray,
+                   x0:float,
+                   y0:float,
+                   resolution:float = _resolution) -> tuple:
+        # Find the column and row of the cell that contain the point
+        return (np.floor((np.asarray(x, dtype=np.float64) - x0) / resolution + 0.5).astype(np.int64),
+                np.floor((np.asarray(y, dtype=np.float64) - y0) / resolution + 0.5).astype(np.int64))
+
+    def burn(map_file:str,
+             x0:float,
+             y0:float,
+             ncols:int,
+             nrows:int,
+             resolution:float = _resolution) -> np.ndarray:
+        # Import necessary packages
+        import geopandas as gpd
+        import shapely
+
+        # Read the polygon, the position of each feature is its label
+        geometry = gpd.read_file(map_file).geometry.values
+        labels = np.full((nrows, ncols), raster._outside, dtype=np.int32)
+
+        # Label the cell by testing its center only within the bounding box of each polygon
+        for num, (minx, miny, maxx, maxy) in enumerate(shapely.bounds(geometry)):
+            (col_start, col_stop), (row_start, row_stop) = raster.cell_index([minx, maxx], [miny, maxy], x0, y0, resolution)
+            col_start, row_start = max(col_start, 0), max(row_start, 0)
+            col_stop, row_stop = min(col_stop, ncols - 1), min(row_stop, nrows - 1)
+            if col_start > col_stop or row_start > row_stop:
+                continue
+            cols, rows = np.meshgrid(np.arange(col_start, col_stop + 1), np.arange(row_start, row_stop + 1))
+            inside = shapely.contains_xy(geometry[num], x0 + cols * resolution, y0 + rows * resolution)
+            labels[rows[inside], cols[inside]] = num
+
+        # Get every segment of the boundary line
+        coords, line_index = shapely.get_coordinates(shapely.get_parts(shapely.boundary(geometry)), return_index=True)
+        same_line = line_index[1:] == line_index[:-1]
+        start, vector = coords[:-1][same_line], (coords[1:] - coords[:-1])[same_line]
+
+        # Densify each segment to less than a quarter cell, mark every cell around the points as boundary cell
+        steps = np.ceil(np.hypot(vector[:, 0], vector[:, 1]) / (resolution / 4)).astype(np.int64) + 1
+        segment = np.repeat(np.arange(len(start)), steps)
+        fraction = (np.arange(len(segment)) - np.repeat(np.cumsum(steps) - steps, steps)) / np.repeat(steps - 1, steps).clip(min=1)
+        points = start[segment] + vector[segment] * fraction[:, None]
+        cols, rows = raster.cell_index(points[:, 0], points[:, 1], x0, y0, resolution)
+        for dcol in (-1, 0, 1):
+            for drow in (-1, 0, 1):
+                valid = (cols + dcol >= 0) & (cols + dcol < ncols) & (rows + drow >= 0) & (rows + drow < nrows)
+                labels[rows[valid] + drow, cols[valid] + dcol] = raster._boundary
+
+        # Return the label raster
+        return labels
+
+    def label_grid(map_file:str,
+                   x:np.ndarray,
+                   y:np.ndarray,
+                   resolution:float = _resolution,
+                   cache_dir:str = file._cache_raster) -> dict:
+        # Import necessary packages
+        import os
+
+        # The label raster is keyed on the boundary file content and the lattice
+        x0, y0, ncols, nrows = raster.lattice(x, y, resolution)
+        key = file.content_hash(map_file)
+        cache_file = os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(map_file))[0]}_{key}_{x0:.6f}_{y0:.6f}_{ncols}_{nrows}_{resolution:.8f}.npy")
+
+        # Only burn the polygon when the boundary file or lattice changed
+        if os.path.exists(cache_file):
+            labels = np.load(cache_file)
+        else:
+            labels = raster.burn(map_file, x0, y0, ncols, nrows, resolution)
+            os.makedirs(cache_dir, exist_ok=True)
+            np.save(f"{cache_file}.tmp.npy", labels)
+            os.replace(f"{cache_file}.tmp.npy", cache_file)
+
+        # Return the label raster along with how to locate a point on it
+        return {"labels":labels, "x0":x0, "y0":y0, "resolution":resolution, "map_file":map_file}
+
+    def lookup(x:np.ndarray,
+               y:np.ndarray,
+               label_grid:dict) -> np.ndarray:
+        # Import necessary packages
+        import geopandas as gpd
+        import shapely
+
+        # Find the cell of each point, point out of the raster is outside of every polygon
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        labels = label_grid["labels"]
+        cols, rows = raster.cell_index(x, y, label_grid["x0"], label_grid["y0"], label_grid["resolution"])
+        valid = (cols >= 0) & (cols < labels.shape[1]) & (rows >= 0) & (rows < labels.shape[0])
+        result = np.full(len(x), raster._outside, dtype=np.int32)
+        result[valid] = labels[rows[valid], cols[valid]]
+
+        # Only the point in boundary cell or out of the raster need the exact polygon test
+        exact = np.flatnonzero((result == raster._boundary) | ~valid)
+        if len(exact) > 0:
+            if "tree" not in label_grid:
+                label_grid["tree"] = shapely.STRtree(gpd.read_file(label_grid["map_file"]).geometry.values)
+            point_index, polygon_index = label_grid["tree"].query(shapely.points(x[exact], y[exact]), predicate="intersects")
+
+            # Keep the first polygon if the point is on the border of two polygons
+            order = np.lexsort((polygon_index, point_index))
+            point_index, polygon_index = point_index[order], polygon_index[order]
+            first = np.unique(point_index, return_index=True)[1]
+            result[exact] = raster._outside
+            result[exact[point_index[first]]] = polygon_index[first]
+
+        # Return the position of the polygon for each point, -1 if not within any polygon
+        return result
@@ -0,0 +1,178 @@
+from .file import file
+from .assignment import assignment
+from .geocode import geocode
+import numpy as np
+import pandas as pd
+
+class refresh:
+    # Column that identify a clinic between two scrape
+    _name_column = "clinic_name"
+    _address_column = "address"
+
+    def read_snapshot(snapshot_file:str = file._gp_parquet,
+                      gp_file:str = file._gp_file) -> pd.DataFrame:
+        # Import necessary packages
+        import os
+
+        # The last stored GP list, fall back to the excel before the first refresh
+        if os.path.exists(snapshot_file):
+            return pd.read_parquet(snapshot_file)
+        return pd.read_excel(gp_file)
+
+    def diff(new_df:pd.DataFrame,
+             snapshot_df:pd.DataFrame,
+             name_column:str = _name_column,
+             address_column:str = _address_column) -> dict:
+        # Compare by normalized name and address so spacing or case change is not counted
+        new_df = new_df.assign(_name=new_df.loc[:,name_column].map(geocode.normalize),
+                               _address=new_df.loc[:,address_column].map(geocode.normalize))
+        snapshot_df = snapshot_df.assign(_name=snapshot_df.loc[:,name_column].map(geocode.normalize),
+                                         _address=snapshot_df.loc[:,address_column].map(geocode.normalize))
+
+        # Same name and address is unchanged
+        unchanged = new_df.merge(snapshot_df.drop(columns=[name_column, address_column]).drop_duplicates(subset=["_name", "_address"]),
+                                 how="inner", on=["_name", "_address"], suffixes=("", "_snapshot"))
+        new_left = new_df.loc[~new_df.set_index(["_name", "_address"]).index.isin(unchanged.set_index(["_name", "_address"]).index)]
+        snapshot_left = snapshot_df.loc[~snapshot_df.set_index(["_name", "_address"]).index.isin(unchanged.set_index(["_name", "_address"]).index)]
+
+        # Same name with a different address is moved, only when the name is not shared by other remaining clinic
+        unique_new = new_left.drop_duplicates(subset="_name", keep=False)
+        unique_snapshot = snapshot_left.drop_duplicates(subset="_name", keep=False)
+        moved = unique_new.merge(unique_snapshot.drop(columns=[name_column, address_column, "_address"]),
+                                 how="inner", on="_name", suffixes=("", "_snapshot"))
+
+        # Everything else is added or removed
+        added = new_left.loc[~new_left.loc[:,"_name"].isin(moved.loc[:,"_name"])]
+        removed = snapshot_left.loc[~snapshot_left.loc[:,"_name"].isin(moved.loc[:,"_name"])]
+
+        # Return each group without the helper column
+        return {key:value.drop(columns=["_name", "_address"]).reset_index(drop=True)
+                for key, value in {"added":added, "removed":removed, "moved":moved, "unchanged":unchanged}.items()}
+
+    def apply(delta:dict,
+              snapshot_df:pd.DataFrame,
+              backend = None,
+              id_column:str = "id",
+              address_column:str = _address_column,
+              cache_file:str = file._cache_geocode) -> pd.DataFrame:
+        # Import necessary packages
+        from .provider import provider
+
+        # Only the added and moved clinic need to be geocoded, the unchanged clinic keep the location from the snapshot
+        # A failed address stop the refresh, otherwise the clinic is kept without location and never geocoded again
+        changed = pd.concat([delta["added"].assign(**{id_column:np.nan}), delta["moved"]], ignore_index=True)
+        if len(changed) > 0:
+            changed = provider.get_lat_lon(changed.drop(columns=["Latitude", "Longitude"], errors="ignore"),
+                                           address_col=address_column, backend=backend, cache_file=cache_file, errors="raise")
+
+        # New clinic get the next id, starting from 0 for the first refresh into an empty snapshot
+        # The district name follow the code of the snapshot
+        last_id = snapshot_df.loc[:,id_column].max()
+        new_id = np.arange(len(delta["added"])) + (0 if pd.isna(last_id) else int(last_id) + 1)
+        changed.loc[changed.loc[:,id_column].isna(), id_column] = new_id
+        if "district" in snapshot_df.columns and "code_state_district" in changed.columns:
+            district_name = snapshot_df.drop_duplicates(subset="code_state_district").set_index("code_state_district")["district"]
+            changed.loc[:,"district"] = changed.loc[:,"code_state_district"].map(district_name)
+
+        # Combine with the unchanged clinic in the same column as the snapshot
+        unchanged = snapshot_df.loc[snapshot_df.loc[:,id_column].isin(delta["unchanged"].loc[:,id_column])]
+        df = pd.concat([unchanged, changed.reindex(columns=snapshot_df.columns)], ignore_index=True)
+
+        # Return the new GP list
+        return df.astype({id_column:snapshot_df.loc[:,id_column].dtype})
+
+    def update_nearest(df:pd.DataFrame,
+                       gp_df:pd.DataFrame,
+                       delta:dict,
+                       snapshot_df:pd.DataFrame,
+                       df1_lat:str = "lat",
+                       df1_lon:str = "lon",
+                       df2_lat:str = "Latitude",
+                       df2_lon:str = "Longitude",
+                       column_to_match:str = "id",
+                       distance_column:str = "distance") -> tuple:
+        # Start from the current assignment with the snapshot GP list it was matched to
+        df = df.copy()
+        state = assignment.build(df, snapshot_df, df1_lat=df1_lat, df1_lon=df1_lon, df2_lat=df2_lat, df2_lon=df2_lon,
+                                 column_to_match=column_to_match, distance_column=distance_column)
+
+        # Moved GP is removed from its old location then added at the new one along with the added GP
+        moved_id = delta["moved"].loc[:,column_to_match].tolist()
+        changed = [assignment.remove_gp(state, delta["removed"].loc[:,column_to_match].tolist() + moved_id)]
+        new_gp = gp_df.loc[~gp_df.loc[:,column_to_match].isin(delta["unchanged"].loc[:,column_to_match])]
+        changed.append(assignment.add_gp(state, new_gp))
+        changed = np.unique(np.concatenate(changed))
+
+        # Refresh the GP column merged from the GP list for the point that changed
+        gp_columns = [column for column in gp_df.columns if column in df.columns and column not in (column_to_match, distance_column)]
+        if len(changed) > 0 and gp_columns:
+            df.iloc[changed, [df.columns.get_loc(column) for column in gp_columns]] = \
+                gp_df.set_index(column_to_match).loc[df.iloc[changed][column_to_match], gp_columns].to_numpy()
+
+        # Return the assignment and the row position of the point that changed their nearest GP
+        return df, changed
+
+    def check_nearest(df:pd.DataFrame,
+                      gp_df:pd.DataFrame,
+                      df1_lat:str = "lat",
+                      df1_lon:str = "lon",
+                      df2_lat:str = "Latitude",
+                      df2_lon:str = "Longitude",
+                      column_to_match:str = "id",
+                      distance_column:str = "distance",
+                      tolerance:float = 1e-9) -> int:
+        # Import necessary packages
+        from .distance import distance
+
+        # Exact nearest distance of every point against every GP of the new list, block by block under the memory ceiling of
+        # distance.haversine_chunks, independent of the KD-tree used by the incremental match. A GP at the same distance is as good
+        if len(gp_df) == 0:
+            return len(df)
+        nearest_km = np.empty(len(df))
+        for start, stop, block in distance.haversine_chunks(df[df1_lat], df[df1_lon], gp_df[df2_lat], gp_df[df2_lon]):
+            nearest_km[start:stop] = block.min(axis=1)
+        mismatch = ~np.isclose(df.loc[:,distance_column].to_numpy(dtype=np.float64), nearest_km, rtol=0, atol=tolerance)
+        mismatch |= ~df.loc[:,column_to_match].isin(gp_df.loc[:,column_to_match]).to_numpy()
+
+        # Return the number of point whose incremental match differ from the exact nearest GP
+        return int(mismatch.sum())
+
+    def run(snapshot_file:str = file._gp_parquet,
+            gp_file:str = file._gp_file,
+            assignment_file:str|None = None,
+            backend = None,
+            base_url:str|None = None,
+            df1_lat:str = "lat",
+            df1_lon:str = "lon",
+            column_to_match:str = "id",
+            distance_column:str = "distance",
+            check:bool = False) -> dict:
+        # Import necessary packages
+        import os
+        from .provider import provider
+
+        # Scrape the new list and compare with the snapshot
+        snapshot_df = refresh.read_snapshot(snapshot_file, gp_file)
+        new_df = provider.read_spm_gp_list() if base_url is None else provider.read_spm_gp_list(base_url=base_url)
+        delta = refresh.diff(new_df, snapshot_df)
+
+        # Geocode the delta only and write the new snapshot
+        gp_df = refresh.apply(delta, snapshot_df, backend=backend, id_column=column_to_match)
+        gp_df.to_parquet(f"{snapshot_file}.tmp", engine="pyarrow", index=False)
+        os.replace(f"{snapshot_file}.tmp", snapshot_file)
+
+        # Only the point affected by the delta is matched again, optionally compared with a full match before it is written
+        changed = None
+        if assignment_file is not None:
+            assignment, changed = refresh.update_nearest(pd.read_parquet(assignment_file), gp_df, delta, snapshot_df,
+                                                         df1_lat=df1_lat, df1_lon=df1_lon,
+                                                         column_to_match=column_to_match, distance_column=distance_column)
+            if check and (mismatch := refresh.check_nearest(assignment, gp_df, df1_lat=df1_lat, df1_lon=df1_lon,
+                                                            column_to_match=column_to_match, distance_column=distance_column)):
+                raise ValueError(f"{mismatch} points differ from the full nearest GP match, {assignment_file} is not updated")
+            assignment.to_parquet(f"{assignment_file}.tmp", engine="pyarrow", index=False)
+            os.replace(f"{assignment_file}.tmp", assignment_file)
+
+        # Return the delta, its count and the number of point that changed their nearest GP, along with the new GP list
+        return {**delta, "gp_list":gp_df, "counts":{key:len(value) for key, value in delta.items()},
+                "changed_points":None if changed is None else len(changed)}
@@ -0,0 +1,153 @@
+import pandas as pd
+import threading
+
+class scraper:
+    # ProtectHealth clinic search page
+    _base_url = "https://kelayakan-spm.protecthealth.com.my/find-clinics"
+    # Number of page fetched at the same time, also the size of the connection pool
+    _max_workers = 8
+    # Retry for connection error and the status below, wait backoff * 2 ** (retry - 1) seconds in between
+    _retries = 4
+    _backoff = 0.5
+    _retry_status = (429, 500, 502, 503, 504)
+    _timeout = 30
+    # Html of each page already fetched, keyed on the url
+    _page_cache = {}
+    _lock = threading.Lock()
+
+    def session(max_workers:int = _max_workers,
+                retries:int = _retries,
+                backoff:float = _backoff) -> "requests.Session":
+        # Import necessary packages
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        # One session for all the pages so the connection is reused, with retry and backoff on every request
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=scraper._retry_status, allowed_methods=["GET"])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        # Return the session
+        return session
+
+    def page_list(state_dict:dict,
+                  selangor_dict:dict,
+                  base_url:str = _base_url) -> list:
+        # Each page as (url, state, code_state_district), in the same order as the site list them
+        page_list = [(f"{base_url}?state_code={key}&page={num}", key, value[1])
+                     for key, value in state_dict.items() for num in range(1, value[0])]
+        page_list += [(f"{base_url}?state_code=selangor&district_code={value[0]}&page={num}", "selangor", value[2])
+                      for value in selangor_dict.values() for num in range(1, value[1])]
+
+        # Return the list
+        return page_list
+
+    def fetch(session:"requests.Session",
+              url:str,
+              timeout:int|float = _timeout,
+              refresh:bool = False) -> str:
+        # Page that has been fetched is not requested again unless refresh
+        if not refresh and url in scraper._page_cache:
+            return scraper._page_cache[url]
+
+        # Fetch the page, error after all the retry is raised
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+        with scraper._lock:
+            scraper._page_cache[url] = response.text
+
+        # Return the html
+        return response.text
+
+    def read_page(html:str,
+                  state:str,
+                  code_state_district:str) -> pd.DataFrame:
+        # Import necessary packages
+        from io import StringIO
+
+        # The clinic list is the first table of the page
+        df = pd.read_html(StringIO(html))[0]
+        df.loc[:,"state"] = state
+        df.loc[:,"code_state_district"] = code_state_district
+
+        # Return the dataframe
+        return df
+
+    def read_pages(page_list:list,
+                   max_workers:int = _max_workers,
+                   timeout:int|float = _timeout,
+                   refresh:bool = False) -> pd.DataFrame:
+        # Import necessary packages
+        from concurrent.futures import ThreadPoolExecutor
+
+        # Fetch and parse the pages at the same time, map keep the order of the page
+        with scraper.session(max_workers=max_workers) as session:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                df_list = list(executor.map(lambda page: scraper.read_page(scraper.fetch(session, page[0], timeout, refresh), page[1], page[2]),
+                                            page_list))
+
+        # Combine all the pages once
+        return pd.concat(df_list, ignore_index=True)
+
+    def fixture_handler(delay:float = 0.0,
+                        fail_first:int = 0,
+                        rows:int = 10):
+        # Import necessary packages
+        import time
+        from collections import Counter
+        from http.server import BaseHTTPRequestHandler
+        from urllib.parse import urlparse, parse_qs
+
+        # Number of request for each page, the first fail_first request of every page return 503 to test the retry
+        request_count = Counter()
+
+        class handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                request_count[self.path] += 1
+                time.sleep(delay)
+                if request_count[self.path] <= fail_first:
+                    self.send_error(503)
+                    return
+
+                # Same layout as the clinic list, name and address in one cell separated by Buka or Tutup
+                query = {key:value[0] for key, value in parse_qs(urlparse(self.path).query).items()}
+                area = query.get("district_code", query.get("state_code", ""))
+                page = query.get("page", "1")
+                body = "".join(f"<tr><td>{num + 1}</td><td>Klinik {area} {page} {num}  {'Buka' if num % 2 else 'Tutup'}  "
+                               f"{num} Jalan {page}, {area} Tel Lokasi</td></tr>" for num in range(rows))
+                html = f"<html><body><table><thead><tr><th>No</th><th>Nama Klinik</th></tr></thead><tbody>{body}</tbody></table></body></html>"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.end_headers()
+                self.wfile.write(html.encode())
+
+            def log_message(self, *args):
+                pass
+
+        # Return the handler class
+        return handler
+
+    def fixture_server(delay:float = 0.0,
+                       fail_first:int = 0,
+                       rows:int = 10):
+        # Import necessary packages
+        import contextlib
+        from http.server import ThreadingHTTPServer
+
+        # Local stand-in for the clinic site, e.g. with scraper.fixture_server(delay=0.2) as base_url: ...
+        @contextlib.contextmanager
+        def server():
+            httpd = ThreadingHTTPServer(("127.0.0.1", 0), scraper.fixture_handler(delay, fail_first, rows))
+            thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+            thread.start()
+            try:
+                yield f"http://127.0.0.1:{httpd.server_address[1]}/find-clinics"
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+
+        # Return the context manager
+        return server()
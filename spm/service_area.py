@@ -0,0 +1,100 @@
+from .file import file
+import pandas as pd
+import polars as pl
+
+class service_area:
+    # Equirectangular projection true to scale at the middle latitude of Malaysia, the Voronoi on it is close to the nearest GP by haversine
+    _crs = {"proj":"eqc", "lat_ts":4}
+    # Equal area projection, same as the district area in population
+    _area_crs = {"proj":"cea"}
+    # Column summed for each service area
+    _sum_columns = ("Z", "estimated_str")
+
+    def read_gp(gp_file:str = file._gp_parquet) -> pd.DataFrame:
+        # The GP list is kept as parquet after refresh, excel before that
+        return pd.read_parquet(gp_file) if gp_file.endswith(".parquet") else pd.read_excel(gp_file)
+
+    def build(gp_df:pd.DataFrame,
+              district_file:str = file._map_district,
+              df2_lat:str = "Latitude",
+              df2_lon:str = "Longitude",
+              column_to_match:str = "id") -> "gpd.GeoDataFrame":
+        # Import necessary packages
+        import geopandas as gpd
+        import shapely
+
+        # Project the district and the GP, buffer 0 to fix the invalid district polygon
+        district = gpd.read_file(district_file).to_crs(service_area._crs)
+        district.geometry = shapely.buffer(district.geometry.values, 0)
+        points = gpd.GeoDataFrame(gp_df.loc[:,[column_to_match]],
+                                  geometry=gpd.points_from_xy(gp_df[df2_lon], gp_df[df2_lat]),
+                                  crs="EPSG:4326").to_crs(service_area._crs)
+
+        # One Voronoi cell for each GP location, GP at the same location share the cell
+        unique_points = points.geometry.values[~points.geometry.to_wkb().duplicated().to_numpy()]
+        cells = shapely.get_parts(shapely.voronoi_polygons(shapely.multipoints(unique_points),
+                                                           extend_to=shapely.box(*district.total_bounds)))
+        cells = gpd.GeoDataFrame(geometry=cells, crs=service_area._crs)\
+                   .sjoin(points, how="inner", predicate="contains")\
+                   .loc[:,[column_to_match, "geometry"]]
+
+        # Clip to the district, which also clip to Malaysia, one piece for each GP and district
+        df = gpd.overlay(cells, district.loc[:,["code_state_district", "district", "geometry"]], how="intersection", keep_geom_type=True)
+        df.loc[:,"area_km2"] = df.geometry.to_crs(service_area._area_crs).area / 10**6
+
+        # Return in lat lon
+        return df.to_crs("EPSG:4326")
+
+    def rollup(df:"gpd.GeoDataFrame",
+               grid_df:pl.DataFrame|pd.DataFrame,
+               column_to_match:str = "id",
+               district_column:str = "code_state_district",
+               sum_columns:tuple = _sum_columns) -> "gpd.GeoDataFrame":
+        # Total of the matched grid for each GP and district, the grid point is already matched to its nearest GP
+        grid_df = pl.from_pandas(grid_df) if isinstance(grid_df, pd.DataFrame) else grid_df
+        sum_columns = [column for column in sum_columns if column in grid_df.columns]
+        total = grid_df.group_by(column_to_match, district_column)\
+                       .agg([pl.col(column).sum() for column in sum_columns] + [pl.len().alias("grid_count")])\
+                       .with_columns(pl.col(column_to_match).cast(pl.from_pandas(df.loc[:,column_to_match]).dtype))\
+                       .to_pandas()
+
+        # Service area without any grid point has zero total
+        df = df.merge(total, how="left", on=[column_to_match, district_column])
+        df = df.fillna({column:0 for column in sum_columns + ["grid_count"]}).astype({"grid_count":"int64"})
+
+        # Return the service area with the total
+        return df
+
+    def cache_file(gp_file:str = file._gp_parquet,
+                   district_file:str = file._map_district,
+                   grid_file:str = file._population_str_ascii_gp_households,
+                   cache_dir:str = file._cache_service_area) -> str:
+        # Import necessary packages
+        import os
+
+        # The cache is keyed on the content of the GP list, the district and the matched grid
+        return os.path.join(cache_dir, f"service_area_{file.content_hash(gp_file, district_file, grid_file)}.parquet")
+
+    def load(gp_file:str = file._gp_parquet,
+             district_file:str = file._map_district,
+             grid_file:str = file._population_str_ascii_gp_households,
+             cache_dir:str = file._cache_service_area,
+             column_to_match:str = "id") -> "gpd.GeoDataFrame":
+        # Import necessary packages
+        import os
+        import geopandas as gpd
+
+        # Only build the service area when any of the input changed
+        cache_file = service_area.cache_file(gp_file, district_file, grid_file, cache_dir)
+        if os.path.exists(cache_file):
+            return gpd.read_parquet(cache_file)
+        df = service_area.rollup(service_area.build(service_area.read_gp(gp_file), district_file, column_to_match=column_to_match),
+                                 pl.read_parquet(grid_file), column_to_match=column_to_match)
+
+        # Write to temporary file then rename to prevent half written cache
+        os.makedirs(cache_dir, exist_ok=True)
+        df.to_parquet(f"{cache_file}.tmp")
+        os.replace(f"{cache_file}.tmp", cache_file)
+
+        # Return the service area
+        return df
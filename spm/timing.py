@@ -0,0 +1,225 @@
+from .memory import memory
+import os
+import threading
+
+class timing:
+    # Opt in with SPM_PROFILE=1, the report is printed at exit or written to SPM_PROFILE_OUTPUT, as json when it end with .json
+    _env = "SPM_PROFILE"
+    _output_env = "SPM_PROFILE_OUTPUT"
+    # SPM_PROFILE_MEMORY=1 also sample the peak RSS of each stage and estimate the size of its output, it imply SPM_PROFILE
+    _memory_env = "SPM_PROFILE_MEMORY"
+    _off = ("", "0", "false", "no", "off")
+    _memory = os.environ.get(_memory_env, "").strip().lower() not in _off
+    _enabled = _memory or os.environ.get(_env, "").strip().lower() not in _off
+    # Total of each function and stage by name, and the stack of the running measurement of each thread for the self time
+    _records = {}
+    _lock = threading.Lock()
+    _local = threading.local()
+
+    def enabled() -> bool:
+        # Return whether the timing is recorded
+        return timing._enabled
+
+    def enable(flag:bool = True,
+               sample_memory:bool|None = None) -> None:
+        # Turn the recording on or off at runtime, the function instrumented at import only exist when SPM_PROFILE is set
+        timing._enabled = flag
+        if sample_memory is not None:
+            timing._memory = sample_memory
+
+    def reset() -> None:
+        # Drop every record, e.g. between two runs in the same process
+        with timing._lock:
+            timing._records.clear()
+
+    def rows(value) -> int|None:
+        # Row count of pandas, geopandas, polars and numpy from the shape, lazy frame and other value has no row count
+        shape = getattr(value, "shape", None)
+        if isinstance(shape, tuple) and len(shape) > 0 and isinstance(shape[0], int):
+            return shape[0]
+
+        # Function returning a tuple, e.g. nearest return (index, distance), count the first item with a row count
+        if isinstance(value, tuple):
+            for item in value:
+                if (count := timing.rows(item)) is not None:
+                    return count
+        return None
+
+    def record(name:str,
+               wall:float,
+               cpu:float,
+               self_wall:float,
+               rows_in:int|None = None,
+               rows_out:int|None = None,
+               frame:dict|None = None) -> None:
+        # Add the measurement to the total of the name
+        with timing._lock:
+            record = timing._records.setdefault(name, {"calls":0, "wall":0.0, "self":0.0, "cpu":0.0, "max_wall":0.0,
+                                                       "rows_in":0, "rows_out":0})
+            record["calls"] += 1
+            record["wall"] += wall
+            record["self"] += self_wall
+            record["cpu"] += cpu
+            record["max_wall"] = max(record["max_wall"], wall)
+            record["rows_in"] += rows_in or 0
+            record["rows_out"] += rows_out or 0
+
+            # Highest peak RSS and rise above the start of the stage, RSS kept after the stage, and the largest output
+            if frame is not None and "peak_rss" in frame:
+                record["peak_rss"] = max(record.get("peak_rss", 0), frame["peak_rss"])
+                record["peak_delta"] = max(record.get("peak_delta", 0), frame["peak_rss"] - frame["rss_start"])
+                record["rss_delta"] = record.get("rss_delta", 0) + frame["rss_end"] - frame["rss_start"]
+                for key in ("out_bytes", "out_object_bytes"):
+                    record[key] = max(record.get(key, 0), frame.get(key, 0))
+
+    def measure(name:str,
+                rows_in:int|None = None):
+        # Import necessary packages
+        import time
+        import contextlib
+
+        @contextlib.contextmanager
+        def measurement():
+            # Time spent in the nested measurement is added to the parent, so the self time exclude it
+            stack = timing._local.__dict__.setdefault("stack", [])
+            frame = {"rows_in":rows_in, "rows_out":None, "child":0.0}
+            stack.append(frame)
+            if timing._memory:
+                memory.track(frame)
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                yield frame
+            finally:
+                wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+                if timing._memory:
+                    memory.untrack(frame)
+                stack.pop()
+                if stack:
+                    stack[-1]["child"] += wall
+
+                # Row count and size of the output, the estimate is not counted in the time
+                output = frame.pop("output", None)
+                if output is not None:
+                    frame["rows_out"] = timing.rows(output) if frame["rows_out"] is None else frame["rows_out"]
+                    if timing._memory:
+                        size = memory.frame_size(output)
+                        frame["out_bytes"], frame["out_object_bytes"] = size["total"], size["object"] + size["native"]
+                timing.record(name, wall, cpu, wall - frame["child"], frame["rows_in"], frame["rows_out"], frame)
+
+        # Return the context manager, the yielded dict take rows_in, rows_out and the output to count and measure
+        return measurement()
+
+    def stage(name:str,
+              rows_in:int|None = None):
+        # Import necessary packages
+        import contextlib
+
+        # Pipeline step inside a function, e.g. with timing.stage("population.str_population_ascii:join") as stage: ...
+        if not timing._enabled:
+            return contextlib.nullcontext({})
+        return timing.measure(name, rows_in)
+
+    def profile(function = None,
+                name:str|None = None):
+        # Import necessary packages
+        import functools
+
+        def decorator(function):
+            label = function.__qualname__ if name is None else name
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                # Only a flag check when the timing is off
+                if not timing._enabled:
+                    return function(*args, **kwargs)
+
+                # Row count of the first dataframe argument and of the result
+                rows_in = next((count for value in (*args, *kwargs.values()) if (count := timing.rows(value)) is not None), None)
+                with timing.measure(label, rows_in) as frame:
+                    result = function(*args, **kwargs)
+                    frame["output"] = result
+                return result
+
+            wrapper._timing = True
+            return wrapper
+
+        # Work as @timing.profile and @timing.profile(name=...)
+        return decorator if function is None else decorator(function)
+
+    def instrument(*classes) -> None:
+        # Import necessary packages
+        import inspect
+
+        # Wrap every public function of the class, generator function is skipped as only its creation would be timed
+        for cls in classes:
+            for name, value in list(vars(cls).items()):
+                if name.startswith("_") or not inspect.isfunction(value) or inspect.isgeneratorfunction(value) or getattr(value, "_timing", False):
+                    continue
+                setattr(cls, name, timing.profile(value, name=f"{cls.__name__}.{name}"))
+
+    def report(sort:str = "wall") -> list:
+        # Return every record as a row, slowest first
+        with timing._lock:
+            row_list = [{"name":name, **record} for name, record in timing._records.items()]
+        return sorted(row_list, key=lambda row: row[sort], reverse=True)
+
+    def table(sort:str = "wall") -> str:
+        # Plain text table of the report, with the memory in MB when it is sampled
+        row_list = timing.report(sort)
+        memory_column = any("peak_rss" in row for row in row_list)
+        header = f"{'name':<56}{'calls':>8}{'wall s':>11}{'self s':>11}{'cpu s':>11}{'max s':>11}{'rows in':>13}{'rows out':>13}"
+        if memory_column:
+            header += f"{'peak MB':>10}{'+peak MB':>10}{'+kept MB':>10}{'out MB':>10}{'obj MB':>10}"
+        line_list = [header, "-" * len(header)]
+        for row in row_list:
+            line = f"{row['name'][:55]:<56}{row['calls']:>8}{row['wall']:>11.4f}{row['self']:>11.4f}{row['cpu']:>11.4f}" \
+                   f"{row['max_wall']:>11.4f}{row['rows_in']:>13,}{row['rows_out']:>13,}"
+            if memory_column:
+                line += "".join(f"{row.get(key, 0) / 2**20:>10.1f}" for key in ("peak_rss", "peak_delta", "rss_delta", "out_bytes", "out_object_bytes"))
+            line_list.append(line)
+
+        # Return the table
+        return "\n".join(line_list)
+
+    def write(output_file:str) -> str:
+        # Import necessary packages
+        import sys
+        import json
+        from datetime import datetime
+
+        # Json when the file end with .json, otherwise the table
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        with open(f"{output_file}.tmp", "w") as f:
+            if output_file.endswith(".json"):
+                json.dump({"created":datetime.now().isoformat(timespec="seconds"), "pid":os.getpid(), "argv":sys.argv,
+                           "records":timing.report()}, f, indent=2)
+            else:
+                f.write(timing.table() + "\n")
+        os.replace(f"{output_file}.tmp", output_file)
+
+        # Return the file path
+        return output_file
+
+    def attach(output_file:str) -> str|None:
+        # Keep the report of the run besides the file it produced, nothing when the timing is off
+        if not timing._enabled or not timing._records:
+            return None
+        return timing.write(f"{output_file}.profile.json")
+
+    def dump() -> None:
+        # Import necessary packages
+        import sys
+
+        # Report of the run at exit, nothing when no function was recorded
+        if not timing._records:
+            return
+        output_file = os.environ.get(timing._output_env)
+        if output_file:
+            timing.write(output_file)
+        else:
+            print(timing.table(), file=sys.stderr)
+
+# Report at exit when the timing is on
+if timing._enabled:
+    import atexit
+    atexit.register(timing.dump)
@@ -5,6 +5,8 @@ import polars as pl
 import plotly.express as px
 import os
 import sys
+from spm.cache import cache
+from spm.file import file
 
 # To ensure the function can be import
 # if os.path.dirname(os.getcwd()) not in sys.path:
@@ -15,9 +17,10 @@ _mapbox_style = [
     'basic', 'streets', 'outdoors', 'light', 'dark', 'satellite', 'satellite- streets', 'stamen-watercolor',
     ]
 
+@cache.cached(file._gp_file, file._full_gp_file)
 def read_gp_data():
-    gp_df = pl.read_excel("./data/information/gp_list.xlsx")
-    all_gp_df = pl.read_excel("./data/information/private_medical_gp.xlsx")
+    gp_df = pl.read_excel(file._gp_file)
+    all_gp_df = pl.read_excel(file._full_gp_file)
     # Return the dataframe
     return gp_df, all_gp_df
 
@@ -166,7 +169,7 @@ def gp_analysis() -> None:
             df.loc[:,"location"] = df.loc[:,address_col].apply(geocode)
             df.loc[:,'Latitude'] = df.loc[:,'location'].apply(lambda loc: tuple(loc.point)[0] if loc else None)
             df.loc[:,'Longitude'] = df.loc[:,'location'].apply(lambda loc: tuple(loc.point)[1] if loc else None)
-        except GeocoderTimedOut or GeocoderRateLimited or GeocoderNotFound:
+        except (GeocoderTimedOut, GeocoderRateLimited, GeocoderNotFound):
             print("Error")
 
         # Return the dataframe
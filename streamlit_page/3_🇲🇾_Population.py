@@ -6,6 +6,9 @@ import plotly.express as px
 from itertools import combinations
 import os
 from dotenv import load_dotenv
+from spm.boundary import boundary
+from spm.cache import cache
+from spm.file import file
 
 # To set the environement
 load_dotenv()
@@ -50,8 +53,9 @@ class map:
     _filter_list = list(zip(combinations(_filter_value.keys(), 2), combinations(_filter_value.values(), 2)))
     _reversed_key = list(_filter_value.keys())[::-1]
 
+    @cache.cached(file._population_district_url)
     def read_population_data():
-        district_population = pl.read_parquet('https://storage.dosm.gov.my/population/population_district.parquet')\
+        district_population = pl.read_parquet(file._population_district_url)\
                             .with_columns(pl.col("age").str.replace("5-9", "05-09"))
         for key, value in map._dict_district.items():
             district_population = district_population.with_columns(pl.col("district").str.replace(key, value))
@@ -153,7 +157,7 @@ def population_analysis() -> None:
     st.markdown("""<p class="subheader">General Malaysian Population Information</p>""", unsafe_allow_html=True)
     
     # Prepare the dataset
-    district_geojson = map.read_geojson_file("./data/map/administrative_2_district.geojson")
+    district_geojson = boundary.read_geojson("./data/map/administrative_2_district.geojson", zoom=5)
     district_population = map.read_population_data()
     
     # To put option for choropleth plot
@@ -9,6 +9,10 @@ import os
 import sys
 from dotenv import load_dotenv
 import os
+from spm.boundary import boundary
+from spm.cache import cache
+from spm.figure import figure
+from spm.file import file
 
 # To set the environement
 load_dotenv()
@@ -73,13 +77,14 @@ class map:
                         marker_line_width:float = 0.5,
                         marker_opacity:float = 0.5,
                         showlegend:bool = True,
-                        text:tuple|None = None):
+                        text:tuple|None = None,
+                        simplify:bool = True):
         # Import necessary packages
         import plotly.graph_objects as go
         import os
 
-        # use json to load the choropleth file
-        geojson_data = map.read_geojson_file(map_file)
+        # Load the choropleth file simplified for the zoom level, or the full resolution file
+        geojson_data = boundary.read_geojson(map_file, zoom=mapbox_zoom if simplify else None)
 
         if text!=None:
             text=df.loc[:,text]
@@ -107,16 +112,17 @@ class map:
         # Return fig
         return fig
 
+    @cache.cached(file._gp_parquet, file._population_district_url, file._population_str_ascii_households)
     def read_data():
-        gp_df = pl.read_parquet("./data/information/gp_list.parquet")
+        gp_df = pl.read_parquet(file._gp_parquet)
 
-        district_population = pl.read_parquet('https://storage.dosm.gov.my/population/population_district.parquet')\
+        district_population = pl.read_parquet(file._population_district_url)\
                             .with_columns(pl.col("age").str.replace("5-9", "05-09"),
                                           pl.col("date").cast(pl.Date).cast(pl.String))
         for key, value in map._dict_district.items():
             district_population = district_population.with_columns(pl.col("district").str.replace(key, value))
 
-        population = pl.read_parquet("./data/information/str_ascii_household.parquet")
+        population = pl.read_parquet(file._population_str_ascii_households)
 
         return population, district_population, gp_df
     
@@ -240,38 +246,50 @@ def str_map_analysis() -> None:
                              options=["District Chorepleth", "Parlimen Chorepleth", "Density Map", "Scatter Buble Map"],
                              horizontal=True)
 
+    # Key of the figure for the widget state, the base key leave out the filter so only the data is swapped when the filter change
+    figure_key = figure.key(map_selection, district_selection, parlimen, color_continuous_scale, mapbox_style, radius, opacity,
+                            sources=(file._population_str_ascii_households,))
+    base_key = figure.key(map_selection, color_continuous_scale, mapbox_style, radius, opacity,
+                          sources=(file._map_district, file._map_parlimen))
+
     if map_selection == "Density Map":
         # Prepare the dataset
         temp_pt = population.select("X","Y", "estimated_str").to_pandas()
 
         # Plot the density map
-        fig = go.Figure(go.Densitymapbox(lat=temp_pt["Y"], lon=temp_pt["X"], z=temp_pt.loc[:,"estimated_str"],
-                                 radius=radius,
-                                 autocolorscale = False, 
-                                 colorscale=color_continuous_scale,
-                                 colorbar_title="Estimated STR Population",
-                                 opacity=opacity,
-                                 showlegend=False,
-                                 text=None,
-                                 zmin=temp_pt.loc[:,"estimated_str"].min(), zmax=temp_pt.loc[:,"estimated_str"].max()))
-        fig.update_layout(mapbox_style=mapbox_style, 
-                          mapbox_accesstoken=os.getenv("MAPBOX_TOKEN"),
-                          mapbox_zoom=5, 
-                          mapbox_center={"lat": 4.389059008652357, "lon": 108.65244272591418})
-        # fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
+        def draw_density():
+            fig = go.Figure(go.Densitymapbox(lat=temp_pt["Y"], lon=temp_pt["X"], z=temp_pt.loc[:,"estimated_str"],
+                                     radius=radius,
+                                     autocolorscale = False, 
+                                     colorscale=color_continuous_scale,
+                                     colorbar_title="Estimated STR Population",
+                                     opacity=opacity,
+                                     showlegend=False,
+                                     text=None,
+                                     zmin=temp_pt.loc[:,"estimated_str"].min(), zmax=temp_pt.loc[:,"estimated_str"].max()))
+            fig.update_layout(mapbox_style=mapbox_style, 
+                              mapbox_accesstoken=os.getenv("MAPBOX_TOKEN"),
+                              mapbox_zoom=5, 
+                              mapbox_center={"lat": 4.389059008652357, "lon": 108.65244272591418})
+            # fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
+            return fig
+
         # Display the figure    
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figure.partial(figure_key, base_key, draw_density,
+                                       lat=temp_pt["Y"], lon=temp_pt["X"], z=temp_pt.loc[:,"estimated_str"],
+                                       zmin=temp_pt.loc[:,"estimated_str"].min(), zmax=temp_pt.loc[:,"estimated_str"].max()),
+                        use_container_width=True)
 
     elif map_selection == "Scatter Buble Map":
         # Prepare the dataset
         temp_pt = population.select("X","Y", "estimated_str", "state").to_pandas()
 
-        # Plot the scatter bubbule map
-        fig = px.scatter_mapbox(temp_pt, lat="Y", lon="X",
-                                size="estimated_str", color="state",
-                                color_continuous_scale=color_continuous_scale,
-                                mapbox_style=mapbox_style,
-                                opacity=opacity)
+        # Plot the scatter bubbule map, one trace for each state so the whole figure is kept for each filter
+        fig = figure.load(figure_key, lambda: px.scatter_mapbox(temp_pt, lat="Y", lon="X",
+                                                                size="estimated_str", color="state",
+                                                                color_continuous_scale=color_continuous_scale,
+                                                                mapbox_style=mapbox_style,
+                                                                opacity=opacity))
 
         st.plotly_chart(fig, use_container_width=True)
 
@@ -309,17 +327,20 @@ def str_map_analysis() -> None:
             # Calculate the str percentage
             merge_pt.loc[:,f"{column}_str_%"] = round(merge_pt.loc[:,"estimated_str"] / (merge_pt.loc[:,column] * 1000) * 100, 2)            
 
-        # Display the chorepleth map
-        st.plotly_chart(map.draw_chorepleth(map_file = "./data/map/administrative_2_district.geojson",
-                                            df = temp_pt,
-                                            location="district",
-                                            z="estimated_str",
-                                            featureidkey="district",
-                                            text="estimated_str",
-                                            colorscale=color_continuous_scale,
-                                            mapbox_style=mapbox_style,
-                                            marker_line_width = 0.5,
-                                            marker_opacity = 0.5,),
+        # Display the chorepleth map, the geometry of the base figure is reused when only the filter changed
+        st.plotly_chart(figure.partial(figure_key, base_key,
+                                       lambda: map.draw_chorepleth(map_file = "./data/map/administrative_2_district.geojson",
+                                                                   df = temp_pt,
+                                                                   location="district",
+                                                                   z="estimated_str",
+                                                                   featureidkey="district",
+                                                                   text="estimated_str",
+                                                                   colorscale=color_continuous_scale,
+                                                                   mapbox_style=mapbox_style,
+                                                                   marker_line_width = 0.5,
+                                                                   marker_opacity = 0.5,),
+                                       locations=temp_pt.loc[:,"district"], z=temp_pt.loc[:,"estimated_str"], text=temp_pt.loc[:,"estimated_str"],
+                                       zmin=temp_pt.loc[:,"estimated_str"].min(), zmax=temp_pt.loc[:,"estimated_str"].max()),
                         use_container_width=True)
         
         # Show the pivoted table 
@@ -338,17 +359,20 @@ def str_map_analysis() -> None:
         temp_pt = population.group_by("parlimen").agg(pl.col("estimated_str").sum())\
                             .with_columns((pl.col("estimated_str")/pl.col("estimated_str").sum() * 100).alias("Percentage")).to_pandas()
         
-        # Display the chorepleth map
-        st.plotly_chart(map.draw_chorepleth(map_file = "./data/map/electoral_0_parlimen.geojson",
-                                            df = temp_pt,
-                                            location="parlimen",
-                                            z="estimated_str",
-                                            featureidkey="parlimen",
-                                            text="estimated_str",
-                                            colorscale=color_continuous_scale,
-                                            mapbox_style=mapbox_style,
-                                            marker_line_width = 0.5,
-                                            marker_opacity = 0.5,),
+        # Display the chorepleth map, the geometry of the base figure is reused when only the filter changed
+        st.plotly_chart(figure.partial(figure_key, base_key,
+                                       lambda: map.draw_chorepleth(map_file = "./data/map/electoral_0_parlimen.geojson",
+                                                                   df = temp_pt,
+                                                                   location="parlimen",
+                                                                   z="estimated_str",
+                                                                   featureidkey="parlimen",
+                                                                   text="estimated_str",
+                                                                   colorscale=color_continuous_scale,
+                                                                   mapbox_style=mapbox_style,
+                                                                   marker_line_width = 0.5,
+                                                                   marker_opacity = 0.5,),
+                                       locations=temp_pt.loc[:,"parlimen"], z=temp_pt.loc[:,"estimated_str"], text=temp_pt.loc[:,"estimated_str"],
+                                       zmin=temp_pt.loc[:,"estimated_str"].min(), zmax=temp_pt.loc[:,"estimated_str"].max()),
                         use_container_width=True)
         
         #Show the pivoted table
@@ -3,7 +3,7 @@ from datetime import date
 import polars as pl
 import pandas as pd
 import numpy as np
-from scipy.stats import skew, kurtosis, shapiro, norm, spearmanr, iqr
+from scipy.stats import norm, spearmanr
 import plotly.express as px
 import plotly.graph_objects as go
 from itertools import combinations
@@ -12,6 +12,9 @@ import sys
 from dotenv import load_dotenv
 import os
 import plotly.figure_factory as ff
+import spm
+from spm.cache import cache
+from spm.file import file
 
 # To set the environement
 load_dotenv()
@@ -115,40 +118,41 @@ class map:
     }
 
     _summary_column_name = ["District Name", "Count of Points", "Mean", "Standard Deviation", "Min", "Max", "Median", "Inter-Quarter Range", "Skew", "Kurtosis", "shapiro"]
-    _summary_function_list = [len, np.mean, np.std, min, max, np.median, iqr, skew, kurtosis, shapiro]
 
+    @cache.cached(file._gp_file, file._population_str_ascii_gp_households)
     def read_data():
-        gp_df = pd.read_excel("./data/information/gp_list.xlsx")
-        population = pd.read_parquet("./data/information/ascii_household_and_gp.parquet")\
+        gp_df = pd.read_excel(file._gp_file)
+        population = pd.read_parquet(file._population_str_ascii_gp_households)\
                        .query(f"code_state_district.isin({gp._district_code_list})")
         return gp_df, population
     
+    @cache.cached(file._gp_file, file._population_str_ascii_gp_households)
+    def summary_table() -> pd.DataFrame:
+        # Descriptive statistics and ann of the 10 districts and each district, the summary is shared by the overview and every tab
+        # It is kept with the data it is read from, so it is computed again only when either file changed
+        gp_df, population = map.read_data()
+        summary_df = spm.descriptive.summary(population, "distance", group_by="district")\
+                        .join(spm.population.ann_grouped(population, n_column="estimated_str", a_column="area", distance_column="distance",
+                                                         group_by="district")\
+                                 .select("district", "ANN", "ann_z_score", "p_value"),
+                              how="left", on="district")\
+                        .to_pandas()
+
+        # To generate the number of GP in each district, and all the districts for the first row
+        gp_count = gp_df.loc[:,"district"].value_counts()
+        summary_df.insert(summary_df.columns.get_loc("ANN"), "Number of GP",
+                          summary_df.loc[:,"district"].map(gp_count).fillna(0).astype(int))
+        summary_df.loc[0,"Number of GP"] = int(gp_count.reindex(population.loc[:,"district"].unique()).fillna(0).sum())
+
+        # Return with the display name
+        return summary_df.rename(columns={"district":map._summary_column_name[0], **spm.descriptive._summary_display_name})
+
     def descriptive_analysis(df:pd.DataFrame,
                              index_name:str,
-                             gp_df:pd.DataFrame,
+                             summary_df:pd.DataFrame,
                              show_descriptive:bool = False) -> pd.DataFrame:
-        # To put the summary of the df
-        answer_dict = dict(zip(map._summary_column_name[1:-1],
-                               [formula(df["distance"]) for formula in map._summary_function_list[:-1]]))
-        
-        # Count shapiro first
-        shapiro_value = shapiro(df["distance"])
-
-        # Add shapiro to the dictionary
-        answer_dict["Shapiro Stats"] = shapiro_value[0]
-        answer_dict["Shapiro p value"] = shapiro_value[1]
-
-        # To generate the number of GP in that area
-        district_list = list(df.loc[:,"district"].unique())
-        answer_dict["Number of GP"] = len(gp_df.query(f"district.isin({district_list})"))
-
-        # Calculate ann
-        ann_dict = gp.ann(df, n_column="estimated_str", a_column="area", distance_column="distance")
-        answer_dict.update(ann_dict)
-
-        # Create descriptive_df
-        descriptive_df = pd.DataFrame(answer_dict, index=[index_name])\
-                           .reset_index().rename(columns={"index":map._summary_column_name[0]})
+        # Take the row of this district from the shared summary
+        descriptive_df = summary_df.loc[summary_df.loc[:,map._summary_column_name[0]] == index_name]
 
         # To display the histogram
         st.plotly_chart(px.histogram(df, x="distance",
@@ -196,42 +200,13 @@ def overlay_analysis():
     # For 1. General
     with tabs[0]:
         st.markdown("""<p class="body_header">Summary of Distance Between Population and Active SPM Service Providing GPs According to District</p>""", unsafe_allow_html=True)
-        # Perform pivot table operation
-        pivot_table = population.pivot_table(
-                index="district", 
-                values="distance", 
-                aggfunc=map._summary_function_list
-            ).reset_index()
-
-        # Flatten the MultiIndex columns
-        pivot_table.columns = map._summary_column_name
-
-        # Separate the Shapiro-Wilk test results into two columns
-        for index, row in pivot_table.iterrows():
-            pivot_table.loc[index, "Shapiro Stats"] = float(row["shapiro"][0])
-            pivot_table.loc[index, "Shapiro p value"] = float(row["shapiro"][1])
-
-        # To merge with len(gp_df) and drop column shapiro
-        # pivot_table.loc[:,"Number of GP"] = len(gp_df)
-        gp_pt = gp_df.pivot_table(index="district", values="clinic_name", aggfunc=len).reset_index()\
-                     .rename(columns={"district":map._summary_column_name[0], "clinic_name":"Number of GP"})
-        pivot_table = pivot_table.merge(gp_pt, how="left", on=map._summary_column_name[0])
-
-        # Calculate ann
-        for district in population.loc[:,"district"].unique():
-            ann_dict = gp.ann(population.query(f"district =='{district}'"), n_column="estimated_str", a_column="area", distance_column="distance")
-        
-            for key,value in ann_dict.items():
-                pivot_table.loc[pivot_table.loc[:,map._summary_column_name[0]] == district,key] = value
-        
-        # To display the histogram?
-        descriptive_df = map.descriptive_analysis(population, index_name="10 Districts", gp_df = gp_df, show_descriptive = False)
+        # Compute the summary of all districts once, the tabs below take their row from it
+        pivot_table = map.summary_table()
 
-        # To concat with descriptive_df
-        pivot_table = pd.concat([descriptive_df,
-                                 pivot_table.drop(columns=map._summary_column_name[-1])], ignore_index=True)
+        # To display the histogram
+        map.descriptive_analysis(population, index_name=pivot_table.iloc[0][map._summary_column_name[0]], summary_df=pivot_table, show_descriptive=False)
 
-        # Drop the original shapiro_test column then show it
+        # Show the summary
         st.dataframe(pivot_table.round(2), hide_index=True, use_container_width=True)
 
         # For the line histogram plot
@@ -277,7 +252,7 @@ def overlay_analysis():
             # Create the descriptive analysis for each district, along with histogram
             descriptive_df = map.descriptive_analysis(population.query(f"district == '{gp._district_name_list[num]}'"),
                                                       index_name = gp._district_name_list[num],
-                                                      gp_df = gp_df,
+                                                      summary_df = pivot_table,
                                                       show_descriptive = True)
 
 if __name__ == "__main__":
@@ -9,9 +9,14 @@ import plotly.graph_objects as go
 from itertools import combinations
 import os
 import sys
+import json
 from dotenv import load_dotenv
 import os
 import plotly.figure_factory as ff
+from spm.cache import cache
+from spm.file import file
+from spm.hexbin import hexbin
+from spm.service_area import service_area
 
 # To set the environement
 load_dotenv()
@@ -50,13 +55,27 @@ class map:
         'Kuching', 'Petaling', 'Timur Laut', 'Ulu Langat', 'W.P. Kuala Lumpur'
     ]
 
+    @cache.cached(file._gp_parquet, file._population_str_ascii_gp_households)
     def read_data():
-        gp_df = pd.read_parquet("./data/information/gp_list.parquet")
+        gp_df = pd.read_parquet(file._gp_parquet)
 
-        population = pd.read_parquet("./data/information/ascii_household_and_gp.parquet")\
+        population = pd.read_parquet(file._population_str_ascii_gp_households)\
                        .query(f"code_state_district.isin({map._district_code_list})")
 
-        return population, gp_df
+        # Assign every point to its hexagon for all resolution once, and pre-aggregate each district
+        population = hexbin.index(population, lat="lat", lon="lon")
+        hex_district = {nx:hexbin.aggregate(population, nx, value="estimated_str", by="district") for nx in hexbin._nx_hexagon}
+
+        return population, gp_df, hex_district
+
+    @cache.cached(file._gp_parquet, file._map_district, file._population_str_ascii_gp_households)
+    def read_service_area():
+        # Service area of each GP with its population total, only rebuilt when the GP list or the grid changed
+        service_df = service_area.load(gp_file=file._gp_parquet)
+
+        # Lighter polygon for drawing
+        service_df.geometry = service_df.geometry.simplify(0.001)
+        return service_df
 
 def str_overlay_analysis() -> None:
     # Header of the page
@@ -75,7 +94,7 @@ def str_overlay_analysis() -> None:
     st.divider()
 
     # Load the data
-    population, gp_df = map.read_data()
+    population, gp_df, hex_district = map.read_data()
 
     # To put option for choropleth plot
     col1, col2 = st.columns(2)
@@ -99,15 +118,14 @@ def str_overlay_analysis() -> None:
                              value = (population.loc[:,"distance"].min(), population.loc[:,"distance"].max()),
                              step = 0.1,
                              key="distance")
+        distance_filter = distance != (population.loc[:,"distance"].min(), population.loc[:,"distance"].max())
         population = population.loc[population.loc[:,"distance"].between(*distance)]
 
-        # For Hexagon
-        nx_hexagon = st.slider("N Hexagon", 
-                               min_value = 100, 
-                               max_value= 2000, 
-                               value = 1000,
-                               step=10,
-                               key="nx_hexagon")
+        # For Hexagon, only the resolution that have been assigned
+        nx_hexagon = st.select_slider("N Hexagon", 
+                                      options = hexbin._nx_hexagon, 
+                                      value = 1000,
+                                      key="nx_hexagon")
 
     with col2:
         mapbox_style = st.selectbox("Mapbox Style", 
@@ -136,20 +154,27 @@ def str_overlay_analysis() -> None:
                                 value = 20,
                                 key = "marker_size")
 
+        # To show the service area of each GP
+        show_service_area = st.checkbox("Show GP Service Area", 
+                                        value = False,
+                                        key = "show_service_area")
+
 
-    population_fig = ff.create_hexbin_mapbox(
-        data_frame=population.loc[:,("lat", "lon", "estimated_str")],
-        lat="lat", 
-        lon="lon",
-        agg_func=np.sum,
-        color = "estimated_str",
-        color_continuous_scale=color_continuous_scale,
-        mapbox_style = mapbox_style,
-        nx_hexagon=nx_hexagon, 
-        opacity=opacity, 
-        min_count=1, 
-        show_original_data=False,
-    )
+    # Use the district aggregate when only the district is filtered, otherwise sum the filtered points by their hexagon
+    if parlimen == [] and not distance_filter:
+        hex_df = hex_district[nx_hexagon]
+        if district_selection != []:
+            hex_df = hex_df.filter(pl.col("district").is_in(district_selection))
+        hex_df = hexbin.rollup(hex_df, value="estimated_str", min_count=1)
+    else:
+        hex_df = hexbin.aggregate(population, nx_hexagon, value="estimated_str", min_count=1)
+
+    # Only draw the precomputed hexagon
+    population_fig = hexbin.figure(hex_df, nx_hexagon,
+                                   value="estimated_str",
+                                   color_continuous_scale=color_continuous_scale,
+                                   mapbox_style=mapbox_style,
+                                   opacity=opacity)
     
     gp_fig = go.Figure(go.Scattermapbox(
         mode = "markers+text",
@@ -163,6 +188,22 @@ def str_overlay_analysis() -> None:
     #                       color="district", 
     #                       text="clinic_name")
 
+    # Service area from the precomputed Voronoi polygon, no nearest search is needed
+    if show_service_area:
+        service_df = map.read_service_area()
+        if district_selection != []:
+            service_df = service_df.loc[service_df.loc[:,"district"].isin(district_selection)]
+        population_fig.add_trace(go.Choroplethmapbox(geojson=json.loads(service_df.geometry.to_json()),
+                                                     locations=service_df.index.astype(str),
+                                                     z=service_df.loc[:,"estimated_str"],
+                                                     colorscale=color_continuous_scale,
+                                                     marker_opacity=opacity / 2,
+                                                     marker_line_width=1,
+                                                     showscale=False,
+                                                     text=[f"GP {gp_id}: {str_count:,.0f} STR, {area:,.1f} km2" for gp_id, str_count, area
+                                                           in service_df.loc[:,["id", "estimated_str", "area_km2"]].itertuples(index=False)],
+                                                     hoverinfo="text"))
+
     population_fig.add_trace(gp_fig.data[0])
 
     population_fig.update_layout(
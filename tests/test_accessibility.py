@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+from spm.accessibility import accessibility
+
+def test_zone_weight_steps_at_each_zone_edge():
+    weight = accessibility.decay_weight(np.array([0.0, 3.0, 3.1, 6.0, 9.9, 10.0, 10.1]))
+    np.testing.assert_allclose(weight, [1.0, 1.0, 0.68, 0.68, 0.22, 0.22, 0.0])
+
+def test_last_zone_weight_extends_to_the_catchment_edge():
+    # A provider between the last zone (8 km) and the catchment radius (10 km) keeps the last zone's weight
+    weight = accessibility.decay_weight(np.array([7.9, 8.5, 10.0, 10.5]), catchment_km=10, zone_km=[3, 6, 8], zone_weight=[1.0, 0.68, 0.22])
+    np.testing.assert_allclose(weight, [0.22, 0.22, 0.22, 0.0])
+
+def test_zone_must_be_increasing_and_match_the_weight():
+    with pytest.raises(ValueError):
+        accessibility.decay_weight(np.array([1.0]), zone_km=[6, 3, 10])
+    with pytest.raises(ValueError):
+        accessibility.decay_weight(np.array([1.0]), zone_km=[3, 6], zone_weight=[1.0, 0.68, 0.22])
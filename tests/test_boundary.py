@@ -0,0 +1,22 @@
+import glob
+import warnings
+import pytest
+import shapely
+from spm.boundary import boundary
+
+@pytest.mark.parametrize("map_file", sorted(glob.glob("data/map/*.geojson")))
+@pytest.mark.parametrize("level", sorted(boundary._zoom_tolerance))
+def test_simplified_geometry_is_valid(map_file, level):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        geojson = boundary.simplify(map_file, boundary._zoom_tolerance[level], boundary._zoom_decimal[level])
+    geometry = [shapely.geometry.shape(feature["geometry"]) for feature in geojson["features"]]
+    assert all(shapely.is_valid(geometry))
+    assert not any(shapely.is_empty(geometry))
+    assert all(value.geom_type in ("Polygon", "MultiPolygon") for value in geometry)
+
+def test_polygonal_drops_the_collapsed_part():
+    square = shapely.box(0, 0, 1, 1)
+    collection = shapely.GeometryCollection([square, shapely.LineString([(2, 2), (3, 3)])])
+    assert boundary.polygonal(collection).equals(square)
+    assert boundary.polygonal(shapely.LineString([(0, 0), (1, 1)])).is_empty
@@ -0,0 +1,27 @@
+import pandas as pd
+import polars as pl
+from spm.cache import cache
+
+def test_cached_pandas_frame_is_not_changed_by_the_caller(tmp_path):
+    source = tmp_path / "data.csv"
+    pd.DataFrame({"district":["Jasin", "Melaka Tengah"], "population":[1, 2]}).to_csv(source, index=False)
+    calls = []
+
+    @cache.cached(str(source))
+    def read_data():
+        calls.append(1)
+        df = pd.read_csv(source)
+        return df, {"total":df.sum(numeric_only=True)}, pl.from_pandas(df)
+
+    df, total, _ = read_data()
+    df.insert(0, "state", "Melaka")
+    df.loc[:,"population"] = 0
+    total["total"].loc["population"] = 0
+
+    df, total, polars_df = read_data()
+    assert len(calls) == 1
+    assert df.columns.tolist() == ["district", "population"]
+    assert df.loc[:,"population"].tolist() == [1, 2]
+    assert total["total"].loc["population"] == 3
+    assert polars_df["population"].to_list() == [1, 2]
+    cache.clear()
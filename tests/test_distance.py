@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from spm.distance import distance
+from spm.refresh import refresh
+
+def random_points(n:int, seed:int = 0) -> tuple:
+    # Points over the bounding box of Malaysia
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0.8, 7.4, n), rng.uniform(99.6, 119.3, n)
+
+def test_haversine_pairwise_matches_haversine():
+    lat1, lon1 = random_points(7, seed=1)
+    lat2, lon2 = random_points(5, seed=2)
+    matrix = distance.haversine_pairwise(lat1, lon1, lat2, lon2)
+    assert matrix.shape == (7, 5)
+    for i in range(7):
+        np.testing.assert_allclose(matrix[i], distance.haversine(np.full(5, lat1[i]), np.full(5, lon1[i]), lat2, lon2))
+
+def test_haversine_chunks_cover_every_row_under_the_ceiling():
+    lat1, lon1 = random_points(1000, seed=3)
+    lat2, lon2 = random_points(50, seed=4)
+    max_bytes = 8 * 8 * 50 * 64
+    blocks = list(distance.haversine_chunks(lat1, lon1, lat2, lon2, max_bytes=max_bytes))
+    assert blocks[0][0] == 0 and blocks[-1][1] == 1000
+    assert all(stop == next_start for (_, stop, _), (next_start, _, _) in zip(blocks, blocks[1:]))
+    assert all(block.shape == (stop - start, 50) and block.nbytes * 8 <= max_bytes for start, stop, block in blocks)
+    np.testing.assert_allclose(np.vstack([block for _, _, block in blocks]), distance.haversine_pairwise(lat1, lon1, lat2, lon2))
+
+def test_nearest_is_the_exact_minimum():
+    lat1, lon1 = random_points(2000, seed=5)
+    lat2, lon2 = random_points(80, seed=6)
+    index, distance_km = distance.nearest(pd.DataFrame({"lat":lat1, "lon":lon1}), "lat", "lon",
+                                          pd.DataFrame({"lat":lat2, "lon":lon2}), "lat", "lon")
+    exact = distance.haversine_pairwise(lat1, lon1, lat2, lon2)
+    np.testing.assert_allclose(distance_km, exact.min(axis=1), rtol=0, atol=1e-9)
+
+def test_check_nearest_finds_a_wrong_match():
+    lat1, lon1 = random_points(500, seed=7)
+    lat2, lon2 = random_points(30, seed=8)
+    gp_df = pd.DataFrame({"id":np.arange(30), "Latitude":lat2, "Longitude":lon2})
+    df = distance.match_nearest(pd.DataFrame({"lat":lat1, "lon":lon1}), "lat", "lon", gp_df, "Latitude", "Longitude", "id", distance_column="distance")
+    assert refresh.check_nearest(df, gp_df) == 0
+    df.loc[:9, "distance"] += 1
+    assert refresh.check_nearest(df, gp_df) == 10
@@ -0,0 +1,30 @@
+import numpy as np
+import polars as pl
+import pytest
+from spm.descriptive import descriptive
+from spm.population import population
+
+def grid(seed:int = 0) -> pl.DataFrame:
+    # Grid points in 3 districts, the area is the same for every point of a district
+    rng = np.random.default_rng(seed)
+    district = rng.choice(["Alor Gajah", "Jasin", "Melaka Tengah"], 300)
+    return pl.DataFrame({"district":district,
+                         "area":pl.Series(district).replace_strict({"Alor Gajah":660.0, "Jasin":676.0, "Melaka Tengah":314.0}),
+                         "estimated_str":rng.uniform(0, 50, 300),
+                         "distance":rng.uniform(0, 20, 300)})
+
+def test_ann_grouped_total_row_label():
+    result = population.ann_grouped(grid(), n_column="estimated_str", a_column="area", distance_column="distance")
+    assert result["district"][0] == "3 Districts"
+    assert result["district"][1:].to_list() == ["Alor Gajah", "Jasin", "Melaka Tengah"]
+
+def test_ann_grouped_total_matches_summary_label():
+    df = grid()
+    summary = descriptive.summary(df, "distance", group_by="district")
+    ann = population.ann_grouped(df, n_column="estimated_str", a_column="area", distance_column="distance")
+    assert summary["district"].to_list() == ann["district"].to_list()
+
+def test_ann_grouped_rejects_group_key_that_is_also_a_column():
+    with pytest.raises(ValueError, match="area"):
+        population.ann_grouped(grid(), n_column="estimated_str", a_column="area", distance_column="distance",
+                               group_by=["district", "area"])
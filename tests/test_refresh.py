@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+from spm.distance import distance
+from spm.geocode import geocode
+from spm.refresh import refresh
+
+def gp_list(n:int, seed:int = 0, start:int = 0) -> pd.DataFrame:
+    # GP list as stored in the snapshot
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"id":np.arange(start, start + n, dtype=np.int64),
+                         "clinic_name":[f"Klinik {num}" for num in range(start, start + n)],
+                         "address":[f"{num} Jalan Merdeka" for num in range(start, start + n)],
+                         "Latitude":rng.uniform(1.2, 6.7, n),
+                         "Longitude":rng.uniform(100.1, 104.3, n)})
+
+def test_apply_into_empty_snapshot(tmp_path):
+    new_df = gp_list(5)
+    snapshot_df = new_df.iloc[:0]
+    delta = refresh.diff(new_df.loc[:,["clinic_name", "address"]], snapshot_df)
+    assert len(delta["added"]) == 5 and len(delta["unchanged"]) == 0
+
+    gp_df = refresh.apply(delta, snapshot_df, backend=geocode.table(new_df), cache_file=str(tmp_path / "geocode.sqlite"))
+    assert gp_df.loc[:,"id"].tolist() == [0, 1, 2, 3, 4]
+    np.testing.assert_allclose(gp_df.loc[:,"Latitude"], new_df.loc[:,"Latitude"])
+
+def test_update_nearest_equals_full_match():
+    rng = np.random.default_rng(1)
+    snapshot_df = gp_list(60, seed=2)
+    grid = pd.DataFrame({"lat":rng.uniform(1.2, 6.7, 3000), "lon":rng.uniform(100.1, 104.3, 3000)})
+    df = distance.match_nearest(grid, "lat", "lon", snapshot_df.loc[:,["id", "Latitude", "Longitude"]], "Latitude", "Longitude", "id",
+                                distance_column="distance")
+
+    # Remove the first 5, move the next 5 and add 8 GPs
+    moved = snapshot_df.iloc[5:10].assign(Latitude=rng.uniform(1.2, 6.7, 5), Longitude=rng.uniform(100.1, 104.3, 5))
+    gp_df = pd.concat([snapshot_df.iloc[10:], moved, gp_list(8, seed=3, start=60)], ignore_index=True)
+    delta = {"removed":snapshot_df.iloc[:5], "moved":moved, "unchanged":snapshot_df.iloc[10:], "added":gp_list(8, seed=3, start=60)}
+
+    df, changed = refresh.update_nearest(df, gp_df, delta, snapshot_df)
+    assert len(changed) > 0
+    assert refresh.check_nearest(df, gp_df) == 0